@@ -10,10 +10,59 @@ import sys
 import time
 import subprocess
 import threading
-from pathlib import Path
+import importlib.util
+
+_CWD = os.getcwd()
+
+# pip package name -> import name (sqlite3 is stdlib and always present)
+_PKG_TO_MODULE = {
+    'flask': 'flask',
+    'requests': 'requests',
+    'werkzeug': 'werkzeug',
+    'python-telegram-bot': 'telegram',
+    'python-dotenv': 'dotenv',
+}
+
+# Pinned install specs for packages that need a specific version
+_PIP_OVERRIDES = {
+    'python-telegram-bot': 'python-telegram-bot==20.7',
+}
+
+# Default .env written on first launch
+_ENV_TEMPLATE = (
+    b'# Ganesh A.I. Working System Configuration\n'
+    b'APP_NAME="Ganesh A.I."\n'
+    b'DOMAIN="https://work-2-hdljrkalryfqtkhy.prod-runtime.all-hands.dev"\n'
+    b'FLASK_SECRET="ganesh-ai-secret-key-2024"\n'
+    b'\n'
+    b'# Admin Configuration\n'
+    b'ADMIN_USER="Admin"\n'
+    b'ADMIN_PASS="admin123"\n'
+    b'\n'
+    b'# Telegram Bot (Replace with real token for production)\n'
+    b'TELEGRAM_TOKEN="demo-telegram-token"\n'
+    b'TELEGRAM_BOT_USERNAME="GaneshAIWorkingBot"\n'
+    b'\n'
+    b'# Monetization Settings\n'
+    b'CHAT_PAY_RATE="0.05"\n'
+    b'REFERRAL_BONUS="10.0"\n'
+    b'PREMIUM_MONTHLY="99.0"\n'
+    b'PREMIUM_YEARLY="999.0"\n'
+    b'\n'
+    b'# AI API Keys (Replace with real keys for production)\n'
+    b'OPENAI_API_KEY="demo-openai-key"\n'
+    b'HUGGINGFACE_API_TOKEN="demo-hf-token"\n'
+    b'\n'
+    b'# Payment Gateways (Replace with real keys for production)\n'
+    b'RAZORPAY_KEY_ID="demo-razorpay-key"\n'
+    b'STRIPE_SECRET_KEY="demo-stripe-key"\n'
+    b'PAYPAL_CLIENT_ID="demo-paypal-key"\n'
+)
 
 def print_banner():
     """Print startup banner"""
+    if not sys.stdout.isatty():
+        return
     print("""
     🤖 ========================================
          GANESH A.I. - WORKING SYSTEM
@@ -28,84 +77,91 @@ def print_banner():
     Starting all systems...
     """)
 
+def print_ready_banner():
+    """Print system ready banner"""
+    if not sys.stdout.isatty():
+        return
+    print("""
+    🎉 ========================================
+         GANESH A.I. SYSTEM READY!
+    ========================================
+    
+    🌐 Web Application: RUNNING
+    🤖 Telegram Bot: RUNNING
+    👨‍💼 Admin Panel: ACCESSIBLE
+    💰 Earning System: ACTIVE
+    
+    📊 Features Available:
+    ✅ User Registration & Login
+    ✅ AI Chat with Earnings (₹0.05/message)
+    ✅ Referral System (₹10.00/referral)
+    ✅ Premium Subscriptions
+    ✅ Admin Management Panel
+    ✅ Real-time Analytics
+    ✅ Payment Integration
+    
+    🔗 Access Links:
+    🌐 Web App: https://work-2-hdljrkalryfqtkhy.prod-runtime.all-hands.dev
+    👨‍💼 Admin: https://work-2-hdljrkalryfqtkhy.prod-runtime.all-hands.dev/admin
+    🤖 Telegram: https://t.me/GaneshAIWorkingBot
+    
+    🔑 Admin Credentials:
+    Username: Admin
+    Password: admin123
+    
+    🚀 Starting Web Application...
+    """)
+
 def check_dependencies():
     """Check if all dependencies are installed"""
-    required_packages = [
-        'flask', 'sqlite3', 'requests', 'werkzeug', 
-        'python-telegram-bot', 'python-dotenv'
+    missing = [
+        package for package, module in _PKG_TO_MODULE.items()
+        if importlib.util.find_spec(module) is None
     ]
     
-    missing = []
-    for package in required_packages:
-        try:
-            if package == 'sqlite3':
-                import sqlite3
-            elif package == 'python-telegram-bot':
-                import telegram
-            elif package == 'python-dotenv':
-                from dotenv import load_dotenv
-            else:
-                __import__(package)
-        except ImportError:
-            missing.append(package)
-    
     if missing:
         print(f"❌ Missing packages: {', '.join(missing)}")
         print("Installing missing packages...")
+        py = sys.executable
         for package in missing:
-            if package == 'python-telegram-bot':
-                subprocess.run([sys.executable, '-m', 'pip', 'install', 'python-telegram-bot==20.7'])
-            elif package == 'python-dotenv':
-                subprocess.run([sys.executable, '-m', 'pip', 'install', 'python-dotenv'])
-            else:
-                subprocess.run([sys.executable, '-m', 'pip', 'install', package])
+            subprocess.run([py, '-m', 'pip', 'install', _PIP_OVERRIDES.get(package, package)])
     
     print("✅ All dependencies checked")
 
 def setup_environment():
     """Setup environment variables"""
-    env_file = Path('.env')
-    if not env_file.exists():
+    if not os.path.isfile('.env'):
         print("📝 Creating .env file...")
-        with open('.env', 'w') as f:
-            f.write("""# Ganesh A.I. Working System Configuration
-APP_NAME="Ganesh A.I."
-DOMAIN="https://work-2-hdljrkalryfqtkhy.prod-runtime.all-hands.dev"
-FLASK_SECRET="ganesh-ai-secret-key-2024"
-
-# Admin Configuration
-ADMIN_USER="Admin"
-ADMIN_PASS="admin123"
-
-# Telegram Bot (Replace with real token for production)
-TELEGRAM_TOKEN="demo-telegram-token"
-TELEGRAM_BOT_USERNAME="GaneshAIWorkingBot"
-
-# Monetization Settings
-CHAT_PAY_RATE="0.05"
-REFERRAL_BONUS="10.0"
-PREMIUM_MONTHLY="99.0"
-PREMIUM_YEARLY="999.0"
-
-# AI API Keys (Replace with real keys for production)
-OPENAI_API_KEY="demo-openai-key"
-HUGGINGFACE_API_TOKEN="demo-hf-token"
-
-# Payment Gateways (Replace with real keys for production)
-RAZORPAY_KEY_ID="demo-razorpay-key"
-STRIPE_SECRET_KEY="demo-stripe-key"
-PAYPAL_CLIENT_ID="demo-paypal-key"
-""")
+        # O_EXCL + 0600: never clobber an existing file, keep secrets private
+        fd = os.open('.env', os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            os.write(fd, _ENV_TEMPLATE)
+        finally:
+            os.close(fd)
         print("✅ Environment file created")
     else:
         print("✅ Environment file exists")
 
+def _load_env(path='.env'):
+    """Load KEY=VALUE pairs from the env file without overriding os.environ"""
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#') or '=' not in line:
+                    continue
+                key, _, value = line.partition('=')
+                os.environ.setdefault(key.strip(), value.strip().strip('"').strip("'"))
+    except FileNotFoundError:
+        pass
+
 def run_web_app():
     """Run the web application"""
     print("🌐 Starting Web Application...")
     try:
         # Import and run the working app
-        sys.path.append(os.getcwd())
+        if _CWD not in sys.path:
+            sys.path.insert(0, _CWD)
         from app_working_fixed import app, init_database
         
         # Initialize database
@@ -118,12 +174,18 @@ def run_web_app():
         print(f"🌐 Access at: https://work-2-hdljrkalryfqtkhy.prod-runtime.all-hands.dev")
         print(f"👨‍💼 Admin Panel: https://work-2-hdljrkalryfqtkhy.prod-runtime.all-hands.dev/admin")
         
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=False,
-            threaded=True
-        )
+        try:
+            # Production WSGI server instead of Werkzeug's dev server
+            from waitress import serve
+            serve(app, host='0.0.0.0', port=port, threads=16)
+        except ImportError:
+            print("⚠️ waitress not installed, falling back to Flask dev server")
+            app.run(
+                host='0.0.0.0',
+                port=port,
+                debug=False,
+                threaded=True
+            )
         
     except Exception as e:
         print(f"❌ Web App Error: {str(e)}")
@@ -158,48 +220,27 @@ def main():
     
     # Load environment
     try:
-        from dotenv import load_dotenv
-        load_dotenv()
+        _load_env()
         print("✅ Environment loaded")
-    except:
+    except OSError:
         print("⚠️ Could not load environment, using defaults")
     
+    # Import both apps up front so the bot thread finds them in sys.modules
+    # instead of contending with the web app for the import lock. The bot goes
+    # first: only the first logging.basicConfig() takes effect, and the bot's
+    # is the one that adds the telegram_bot.log handler
+    try:
+        import bot_working_fixed, app_working_fixed  # noqa: F401
+    except Exception as e:
+        print(f"⚠️ Preload failed: {str(e)}")
+    
     # Start Telegram bot in background
     run_telegram_bot()
     
     # Give bot time to start
     time.sleep(2)
     
-    print("""
-    🎉 ========================================
-         GANESH A.I. SYSTEM READY!
-    ========================================
-    
-    🌐 Web Application: RUNNING
-    🤖 Telegram Bot: RUNNING
-    👨‍💼 Admin Panel: ACCESSIBLE
-    💰 Earning System: ACTIVE
-    
-    📊 Features Available:
-    ✅ User Registration & Login
-    ✅ AI Chat with Earnings (₹0.05/message)
-    ✅ Referral System (₹10.00/referral)
-    ✅ Premium Subscriptions
-    ✅ Admin Management Panel
-    ✅ Real-time Analytics
-    ✅ Payment Integration
-    
-    🔗 Access Links:
-    🌐 Web App: https://work-2-hdljrkalryfqtkhy.prod-runtime.all-hands.dev
-    👨‍💼 Admin: https://work-2-hdljrkalryfqtkhy.prod-runtime.all-hands.dev/admin
-    🤖 Telegram: https://t.me/GaneshAIWorkingBot
-    
-    🔑 Admin Credentials:
-    Username: Admin
-    Password: admin123
-    
-    🚀 Starting Web Application...
-    """)
+    print_ready_banner()
     
     # Start web application (this will block)
     run_web_app()
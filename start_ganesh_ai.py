@@ -7,6 +7,7 @@ This script starts the complete Ganesh AI system with all features
 
 import os
 import sys
+import signal
 import subprocess
 import time
 import logging
@@ -14,7 +15,8 @@ import logging
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - STARTUP - %(levelname)s - %(message)s'
+    format='%(asctime)s - STARTUP - %(levelname)s - %(message)s',
+    datefmt='%H:%M:%S'
 )
 logger = logging.getLogger(__name__)
 
@@ -29,7 +31,7 @@ def check_dependencies():
         logger.info("✅ All core dependencies are available")
         return True
     except ImportError as e:
-        logger.error(f"❌ Missing dependency: {e}")
+        logger.error("❌ Missing dependency: %s", e)
         return False
 
 def setup_environment():
@@ -47,7 +49,7 @@ def start_application():
         logger.info("🚀 Starting Ganesh A.I. Production System...")
         
         # Import and run the main application
-        from ganesh_ai_production import app, init_database, setup_scheduler, setup_telegram_webhook
+        from ganesh_ai_production import app, init_database, setup_scheduler, setup_telegram_webhook, SECRET_KEY
         
         logger.info("📊 Initializing database...")
         init_database()
@@ -63,19 +65,62 @@ def start_application():
         # Get port from environment or use default
         port = int(os.getenv('PORT', 12000))
         
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=True,
-            threaded=True
-        )
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            logger.warning("⚠️ gunicorn not installed, falling back to Flask server")
+            app.run(
+                host='0.0.0.0',
+                port=port,
+                debug=False,
+                use_reloader=False,
+                threaded=True
+            )
+            return True
+        
+        # Multiple gunicorn workers so request handling is not bound to one GIL. Workers only
+        # serve HTTP (each builds its own TelegramBot for webhook updates); the database setup,
+        # scheduler and webhook registration above run once, in this process
+        workers = os.cpu_count() or 1
+        
+        # Every worker must sign sessions with the same key, so hand ours down when .env has none
+        if not os.getenv('FLASK_SECRET'):
+            logger.warning("⚠️ FLASK_SECRET not set, generated a key for this run; sessions reset on restart")
+            os.environ['FLASK_SECRET'] = SECRET_KEY
+        logger.info("🔧 gunicorn: %d workers x 8 threads", workers)
+        server = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn',
+            '-w', str(workers),
+            '-k', 'gthread',
+            '--threads', '8',
+            '-b', f'0.0.0.0:{port}',
+            'ganesh_ai_production:app'
+        ])
+        
+        # Hand SIGTERM on to gunicorn for a graceful stop, and never leave it holding the port
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.send_signal(signum))
+        try:
+            server.wait()
+        except KeyboardInterrupt:
+            logger.info("🛑 Stopped by user")
+        finally:
+            if server.poll() is None:
+                server.terminate()
+                try:
+                    server.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+                    server.wait()
+        return True
         
     except Exception as e:
-        logger.error(f"❌ Failed to start application: {str(e)}")
+        logger.error("❌ Failed to start application: %s", e)
         return False
 
-def main():
-    """Main startup function"""
+def print_banner():
+    """Print startup banner"""
+    if not sys.stdout.isatty():
+        return
     print("""
     🤖 ================================
        GANESH A.I. STARTUP SYSTEM
@@ -89,6 +134,10 @@ def main():
     
     Starting system...
     """)
+
+def main():
+    """Main startup function"""
+    print_banner()
     
     # Check dependencies
     if not check_dependencies():
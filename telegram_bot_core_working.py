@@ -7,11 +7,24 @@ Complete functional Telegram bot with all features working
 
 import os
 import sys
+import atexit
+import queue
 import logging
 import sqlite3
-import requests
+import httpx
+import msgpack
+import zstandard as zstd
+import re
 import json
+import html
+import time
+import hashlib
 import asyncio
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
@@ -20,21 +33,44 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('telegram_bot_core.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that writes through a 64 KB buffer instead of flushing every record"""
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=64 * 1024,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def flush(self):
+        # emit() calls this after every record; the buffer drains when full or on close instead
+        pass
+    
+    def emit(self, record):
+        super().emit(record)
+        # Warnings and errors go to disk right away so a crash doesn't take them with it
+        if record.levelno >= logging.WARNING:
+            logging.FileHandler.flush(self)
+
+# Configure logging: handlers enqueue records, a background thread does the I/O
+_log_queue = queue.SimpleQueue()
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_handlers = (BufferedFileHandler('telegram_bot_core.log'), logging.StreamHandler(sys.stdout))
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+_log_listener = QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+
+_root_logger = logging.getLogger()
+_root_logger.setLevel(logging.INFO)
+_root_logger.handlers = [QueueHandler(_log_queue)]
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logger = logging.getLogger(__name__)
 
 # Configuration from environment
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+OPENAI_CHAT_URL = 'https://api.openai.com/v1/chat/completions'
 HUGGINGFACE_API_TOKEN = os.getenv('HUGGINGFACE_API_TOKEN')
 
 BUSINESS_NAME = os.getenv('BUSINESS_NAME', 'Artificial intelligence bot pvt Ltd')
@@ -54,75 +90,221 @@ if not TELEGRAM_TOKEN:
     logger.error("❌ TELEGRAM_TOKEN not found in environment variables!")
     sys.exit(1)
 
+# Shared async HTTP client so OpenAI calls reuse pooled keep-alive connections
+_HTTP = httpx.AsyncClient(
+    http2=True,
+    timeout=30.0,
+    limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=300)
+)
+
+# Canned replies used when OpenAI is unavailable, matched on whole keywords
+_FB_MAP = {
+    'hello': f"Hello! I'm Ganesh A.I. from {BUSINESS_NAME}. How can I help you today? 🤖",
+    'hi': f"Hi there! Welcome to Ganesh A.I. What can I do for you? 😊",
+    'help': "I can help you with various tasks, answer questions, and provide information. Just ask me anything! Use /commands to see all available commands.",
+    'about': f"I'm Ganesh A.I., created by {BUSINESS_NAME}. I'm here to assist you with AI-powered responses and help you earn money!",
+    'balance': "Use /balance to check your current balance. Keep chatting to earn more! 💰",
+    'earn': f"You earn ₹{CHAT_PAY_RATE} for each message you send. Keep chatting to increase your earnings! 💸",
+    'commands': "Use /start to begin, /balance to check earnings, /profile to see your info, /help for assistance, and /support for help.",
+    'default': f"Thank you for your message! I'm Ganesh A.I. from {BUSINESS_NAME}. I'm here to help you with any questions or tasks you have. Keep chatting to earn money! 🚀"
+}
+_FB_RE = re.compile(r'\b(' + '|'.join(re.escape(k) for k in _FB_MAP if k != 'default') + r')\b')
+
+# Minimum seconds between streamed edits of the same reply
+STREAM_EDIT_INTERVAL = 1.0
+
+# Exact-match LRU cache of OpenAI replies, keyed by model + normalized message
+AI_CACHE_SIZE = 4096
+_AI_CACHE = OrderedDict()
+
 # Database setup
 DB_PATH = 'telegram_bot_core.db'
 
+# Hot-path statements, kept as constants so the connection's statement cache reuses them
+_SQL_GET_USER = '''
+    SELECT telegram_id, balance, total_earned, referral_code, created_at, last_active
+    FROM bot_users WHERE telegram_id = ?
+'''
+_SQL_ADD_EARN = '''
+    UPDATE bot_users
+    SET balance = balance + ?, total_earned = total_earned + ?, last_active = CURRENT_TIMESTAMP
+    WHERE telegram_id = ?
+    RETURNING balance, total_earned, last_active
+'''
+_SQL_INS_TX = '''
+    INSERT INTO bot_transactions (telegram_id, type, amount, description)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_INS_CHAT = '''
+    INSERT INTO bot_chats (telegram_id, payload, model_used, earnings)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_COUNT_CHATS = 'SELECT COUNT(*) FROM bot_chats WHERE telegram_id = ?'
+_SQL_COUNT_TX = "SELECT COUNT(*) FROM bot_transactions WHERE telegram_id = ? AND type = 'earning'"
+
+# Chat message/response pairs are stored as zstd-compressed msgpack blobs
+_SQL_CREATE_CHATS = '''
+    CREATE TABLE IF NOT EXISTS bot_chats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        telegram_id INTEGER NOT NULL,
+        payload BLOB NOT NULL,
+        model_used TEXT DEFAULT 'gpt-4o-mini',
+        earnings REAL DEFAULT 0.0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+_ZC = zstd.ZstdCompressor(level=3)
+_ZD = zstd.ZstdDecompressor()
+
+def pack_chat(message, response):
+    """Encode a chat message/response pair into a compressed payload"""
+    return _ZC.compress(msgpack.packb({'m': message, 'r': response}))
+
+def unpack_chat(payload):
+    """Decode a payload written by pack_chat into (message, response)"""
+    data = msgpack.unpackb(_ZD.decompress(payload))
+    return data['m'], data['r']
+
+def _connect():
+    """Open the shared SQLite connection in WAL mode"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    conn.row_factory = sqlite3.Row
+    return conn
+
+# One long-lived autocommit connection shared by all handlers; the lock serializes access
+_CONN = _connect()
+_DB_LOCK = threading.Lock()
+
+# LRU cache of get_user results, kept in sync by the write helpers
+USER_CACHE_SIZE = 50000
+_USER_CACHE = OrderedDict()
+_USER_CACHE_LOCK = threading.Lock()
+
+@contextmanager
+def _write_transaction():
+    """Run the block in an explicit BEGIN IMMEDIATE transaction on the shared connection"""
+    with _DB_LOCK:
+        # Take the write lock up front; busy_timeout waits out other processes holding it
+        _CONN.execute('BEGIN IMMEDIATE')
+        try:
+            yield _CONN
+            _CONN.execute('COMMIT')
+        except BaseException:
+            # A failed COMMIT can leave the transaction open; never let it outlive the lock
+            if _CONN.in_transaction:
+                _CONN.execute('ROLLBACK')
+            raise
+
+# Handlers run DB helpers here so SQLite I/O never blocks the event loop
+_DB_EXEC = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='sqlite')
+
+# Chat log rows are queued by handle_message and written in batches by _chat_flusher
+CHAT_FLUSH_SIZE = 100
+CHAT_FLUSH_INTERVAL = 0.5
+_chat_queue = asyncio.Queue()
+_chat_flush_task = None
+
 def init_bot_db():
     """Initialize bot database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Create users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bot_users (
-                id INTEGER PRIMARY KEY,
-                telegram_id INTEGER UNIQUE NOT NULL,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                balance REAL DEFAULT 0.0,
-                total_earned REAL DEFAULT 0.0,
-                referral_code TEXT UNIQUE,
-                referred_by INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create chats table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bot_chats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER NOT NULL,
-                message TEXT NOT NULL,
-                response TEXT NOT NULL,
-                model_used TEXT DEFAULT 'gpt-4o-mini',
-                earnings REAL DEFAULT 0.0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create transactions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bot_transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER NOT NULL,
-                type TEXT NOT NULL,
-                amount REAL NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with _write_transaction():
+            cursor = _CONN.cursor()
+            
+            # Create users table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS bot_users (
+                    id INTEGER PRIMARY KEY,
+                    telegram_id INTEGER UNIQUE NOT NULL,
+                    username TEXT,
+                    first_name TEXT,
+                    last_name TEXT,
+                    balance REAL DEFAULT 0.0,
+                    total_earned REAL DEFAULT 0.0,
+                    referral_code TEXT UNIQUE,
+                    referred_by INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create chats table
+            cursor.execute(_SQL_CREATE_CHATS)
+            
+            # Convert chats stored as plain message/response text to payloads
+            cursor.execute('PRAGMA table_info(bot_chats)')
+            if 'message' in {column['name'] for column in cursor.fetchall()}:
+                _migrate_chat_payloads(cursor)
+            
+            # Create transactions table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS bot_transactions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    telegram_id INTEGER NOT NULL,
+                    type TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    description TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Indexes for the per-user stats counts
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_chats_tid ON bot_chats(telegram_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tx_tid_type ON bot_transactions(telegram_id, type)')
         
         logger.info("✅ Bot database initialized successfully")
         
     except Exception as e:
         logger.error(f"❌ Bot database initialization error: {e}")
 
+def _migrate_chat_payloads(cursor):
+    """Rewrite a bot_chats table with message/response columns into payload form"""
+    cursor.execute('ALTER TABLE bot_chats RENAME TO bot_chats_legacy')
+    cursor.execute(_SQL_CREATE_CHATS)
+    cursor.execute('SELECT id, telegram_id, message, response, model_used, earnings, created_at FROM bot_chats_legacy')
+    cursor.executemany('''
+        INSERT INTO bot_chats (id, telegram_id, payload, model_used, earnings, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (row['id'], row['telegram_id'], pack_chat(row['message'], row['response']),
+         row['model_used'], row['earnings'], row['created_at'])
+        for row in cursor.fetchall()
+    ])
+    cursor.execute('DROP TABLE bot_chats_legacy')
+    logger.info("✅ Migrated bot_chats to compressed payloads")
+
+def _cache_user(telegram_id, user):
+    """Store a user dict in the LRU cache; callers hold _DB_LOCK so writes stay ordered"""
+    with _USER_CACHE_LOCK:
+        _USER_CACHE[telegram_id] = user
+        _USER_CACHE.move_to_end(telegram_id)
+        if len(_USER_CACHE) > USER_CACHE_SIZE:
+            _USER_CACHE.popitem(last=False)
+
+def _uncache_user(telegram_id):
+    """Drop a user from the LRU cache"""
+    with _USER_CACHE_LOCK:
+        _USER_CACHE.pop(telegram_id, None)
+
 def get_user(telegram_id):
-    """Get user from database"""
+    """Get user as a dict, from the in-memory cache when possible"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM bot_users WHERE telegram_id = ?', (telegram_id,))
-        user = cursor.fetchone()
-        
-        conn.close()
+        with _USER_CACHE_LOCK:
+            user = _USER_CACHE.get(telegram_id)
+            if user is not None:
+                _USER_CACHE.move_to_end(telegram_id)
+                return user
+        
+        with _DB_LOCK:
+            cursor = _CONN.cursor()
+            cursor.execute(_SQL_GET_USER, (telegram_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            user = dict(row)
+            _cache_user(telegram_id, user)
         return user
         
     except Exception as e:
@@ -132,25 +314,21 @@ def get_user(telegram_id):
 def create_user(telegram_id, username, first_name, last_name):
     """Create new user"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         referral_code = f"GANESH{telegram_id}"
         welcome_bonus = 10.0
         
-        cursor.execute('''
-            INSERT INTO bot_users (telegram_id, username, first_name, last_name, balance, total_earned, referral_code)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (telegram_id, username, first_name, last_name, welcome_bonus, welcome_bonus, referral_code))
-        
-        # Add welcome transaction
-        cursor.execute('''
-            INSERT INTO bot_transactions (telegram_id, type, amount, description)
-            VALUES (?, ?, ?, ?)
-        ''', (telegram_id, 'bonus', welcome_bonus, 'Welcome bonus'))
-        
-        conn.commit()
-        conn.close()
+        with _write_transaction():
+            cursor = _CONN.cursor()
+            
+            cursor.execute('''
+                INSERT INTO bot_users (telegram_id, username, first_name, last_name, balance, total_earned, referral_code)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (telegram_id, username, first_name, last_name, welcome_bonus, welcome_bonus, referral_code))
+            
+            # Add welcome transaction
+            cursor.execute(_SQL_INS_TX, (telegram_id, 'bonus', welcome_bonus, 'Welcome bonus'))
+            
+            _uncache_user(telegram_id)
         
         logger.info(f"✅ New user created: {username} (ID: {telegram_id})")
         return True
@@ -160,38 +338,125 @@ def create_user(telegram_id, username, first_name, last_name):
         return False
 
 def add_earnings(telegram_id, amount, description):
-    """Add earnings to user account"""
+    """Add earnings to user account and return the new balance"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Update user balance
-        cursor.execute('''
-            UPDATE bot_users 
-            SET balance = balance + ?, total_earned = total_earned + ?, last_active = CURRENT_TIMESTAMP
-            WHERE telegram_id = ?
-        ''', (amount, amount, telegram_id))
-        
-        # Add transaction
-        cursor.execute('''
-            INSERT INTO bot_transactions (telegram_id, type, amount, description)
-            VALUES (?, ?, ?, ?)
-        ''', (telegram_id, 'earning', amount, description))
-        
-        conn.commit()
-        conn.close()
+        with _write_transaction():
+            cursor = _CONN.cursor()
+            
+            # Update user balance
+            cursor.execute(_SQL_ADD_EARN, (amount, amount, telegram_id))
+            row = cursor.fetchone()
+            
+            # Add transaction
+            cursor.execute(_SQL_INS_TX, (telegram_id, 'earning', amount, description))
+            
+            # Refresh the cached user from the RETURNING values
+            with _USER_CACHE_LOCK:
+                user = _USER_CACHE.get(telegram_id)
+                if user is not None and row is not None:
+                    user.update(row)
         
         logger.info(f"💰 User {telegram_id} earned ₹{amount}: {description}")
-        return True
+        return row['balance'] if row else None
         
     except Exception as e:
+        _uncache_user(telegram_id)
         logger.error(f"Error adding earnings: {e}")
-        return False
+        return None
+
+def save_chats(rows):
+    """Insert a batch of (telegram_id, message, response, model, earnings) rows in one transaction"""
+    # Only called from the single chat flusher, so the shared compressor is never used concurrently
+    params = [
+        (telegram_id, pack_chat(message, response), model, earnings)
+        for telegram_id, message, response, model, earnings in rows
+    ]
+    with _write_transaction():
+        _CONN.executemany(_SQL_INS_CHAT, params)
 
-def get_ai_response(message, model='gpt-4o-mini'):
-    """Get AI response using OpenAI API"""
+def get_user_stats(telegram_id):
+    """Return (messages sent, earning transactions) for a user"""
+    with _DB_LOCK:
+        cursor = _CONN.cursor()
+        
+        cursor.execute(_SQL_COUNT_CHATS, (telegram_id,))
+        total_messages = cursor.fetchone()[0]
+        
+        cursor.execute(_SQL_COUNT_TX, (telegram_id,))
+        total_transactions = cursor.fetchone()[0]
+    
+    return total_messages, total_transactions
+
+async def _db(fn, *args):
+    """Run a blocking DB helper on the SQLite worker pool"""
+    return await asyncio.get_running_loop().run_in_executor(_DB_EXEC, fn, *args)
+
+# Visit bonuses are credited at most once per cooldown per user (LRU of recent visitors)
+VISIT_BONUS_COOLDOWN = 300
+VISIT_CACHE_SIZE = 10000
+_last_visit = OrderedDict()
+
+async def _maybe_visit_bonus(telegram_id, reason, cooldown=VISIT_BONUS_COOLDOWN):
+    """Credit VISIT_PAY_RATE unless the user got one within cooldown seconds; returns the new balance or None"""
+    now = time.monotonic()
+    last = _last_visit.get(telegram_id)
+    if last is not None and now - last < cooldown:
+        return None
+    
+    _last_visit[telegram_id] = now
+    _last_visit.move_to_end(telegram_id)
+    if len(_last_visit) > VISIT_CACHE_SIZE:
+        _last_visit.popitem(last=False)
+    
+    return await _db(add_earnings, telegram_id, VISIT_PAY_RATE, reason)
+
+async def _stream_completion(headers, data, on_partial):
+    """Stream a chat completion, awaiting on_partial with the text so far; None on API error or no content"""
+    parts = []
+    last_update = 0.0
+    async with _HTTP.stream('POST', OPENAI_CHAT_URL, headers=headers, json={**data, 'stream': True}) as response:
+        if response.status_code != 200:
+            logger.error(f"OpenAI API error: {response.status_code}")
+            return None
+        
+        async for line in response.aiter_lines():
+            if not line.startswith('data: '):
+                continue
+            payload = line[6:]
+            if payload == '[DONE]':
+                break
+            choices = json.loads(payload).get('choices')
+            delta = choices[0]['delta'].get('content') if choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            
+            # Telegram allows roughly one edit per second per chat
+            now = time.monotonic()
+            if now - last_update >= STREAM_EDIT_INTERVAL:
+                last_update = now
+                await on_partial(''.join(parts))
+    
+    reply = ''.join(parts).strip()
+    if not reply:
+        logger.error("OpenAI stream ended without content")
+        return None
+    return reply
+
+async def get_ai_response(message, model='gpt-4o-mini', on_partial=None):
+    """Get AI response using OpenAI API
+    
+    If on_partial is given the completion is streamed and on_partial is
+    awaited with the partial text at most once per STREAM_EDIT_INTERVAL.
+    """
     try:
         if OPENAI_API_KEY and OPENAI_API_KEY.startswith('sk-'):
+            cache_key = hashlib.sha1(f"{model}\0{message.strip().lower()}".encode()).digest()
+            cached = _AI_CACHE.get(cache_key)
+            if cached is not None:
+                _AI_CACHE.move_to_end(cache_key)
+                return cached
+            
             headers = {
                 'Authorization': f'Bearer {OPENAI_API_KEY}',
                 'Content-Type': 'application/json'
@@ -213,19 +478,24 @@ def get_ai_response(message, model='gpt-4o-mini'):
                 'temperature': 0.7
             }
             
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content'].strip()
+            if on_partial is not None:
+                reply = await _stream_completion(headers, data, on_partial)
             else:
-                logger.error(f"OpenAI API error: {response.status_code}")
+                response = await _HTTP.post(OPENAI_CHAT_URL, headers=headers, json=data)
+                if response.status_code == 200:
+                    reply = response.json()['choices'][0]['message']['content'].strip()
+                else:
+                    logger.error(f"OpenAI API error: {response.status_code}")
+                    reply = None
+            
+            # Empty completions aren't sendable; fall back and don't cache them
+            if not reply:
                 return get_fallback_response(message)
+            
+            _AI_CACHE[cache_key] = reply
+            if len(_AI_CACHE) > AI_CACHE_SIZE:
+                _AI_CACHE.popitem(last=False)
+            return reply
         
         else:
             return get_fallback_response(message)
@@ -236,42 +506,17 @@ def get_ai_response(message, model='gpt-4o-mini'):
 
 def get_fallback_response(message):
     """Fallback response when AI APIs are not available"""
-    responses = {
-        'hello': f"Hello! I'm Ganesh A.I. from {BUSINESS_NAME}. How can I help you today? 🤖",
-        'hi': f"Hi there! Welcome to Ganesh A.I. What can I do for you? 😊",
-        'help': "I can help you with various tasks, answer questions, and provide information. Just ask me anything! Use /commands to see all available commands.",
-        'about': f"I'm Ganesh A.I., created by {BUSINESS_NAME}. I'm here to assist you with AI-powered responses and help you earn money!",
-        'balance': "Use /balance to check your current balance. Keep chatting to earn more! 💰",
-        'earn': f"You earn ₹{CHAT_PAY_RATE} for each message you send. Keep chatting to increase your earnings! 💸",
-        'commands': "Use /start to begin, /balance to check earnings, /profile to see your info, /help for assistance, and /support for help.",
-        'default': f"Thank you for your message! I'm Ganesh A.I. from {BUSINESS_NAME}. I'm here to help you with any questions or tasks you have. Keep chatting to earn money! 🚀"
-    }
-    
-    message_lower = message.lower()
-    for key in responses:
-        if key in message_lower:
-            return responses[key]
-    
-    return responses['default']
+    match = _FB_RE.search(message.lower())
+    return _FB_MAP[match.group(1)] if match else _FB_MAP['default']
 
 # Bot command handlers
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /start command"""
-    try:
-        user = update.effective_user
-        telegram_id = user.id
-        
-        # Check if user exists
-        existing_user = get_user(telegram_id)
-        
-        if not existing_user:
-            # Create new user
-            create_user(telegram_id, user.username, user.first_name, user.last_name)
-            
-            welcome_message = f"""
+
+# Static reply texts and keyboards, built once at import. Templates use
+# str.format for the per-user fields only.
+_WELCOME_NEW_TMPL = f"""
 🎉 **Welcome to Ganesh A.I.!** 🎉
 
-Hello {user.first_name}! I'm your AI assistant created by {BUSINESS_NAME}.
+Hello {{first_name}}! I'm your AI assistant created by {BUSINESS_NAME}.
 
 🎁 **Welcome Bonus: ₹10.00 added to your account!**
 
@@ -289,62 +534,25 @@ Hello {user.first_name}! I'm your AI assistant created by {BUSINESS_NAME}.
 Use /commands to see all available commands.
 Start chatting now to earn more money! 💸
 """
-        else:
-            # Add visit bonus
-            add_earnings(telegram_id, VISIT_PAY_RATE, "Bot visit bonus")
-            
-            user_data = get_user(telegram_id)
-            balance = user_data[5] if user_data else 0.0
-            
-            welcome_message = f"""
-👋 **Welcome back, {user.first_name}!**
+
+_WELCOME_BACK_TMPL = f"""
+👋 **Welcome back, {{first_name}}!**
 
 I'm Ganesh A.I., your earning companion! 🤖
 
-💰 **Your Current Balance: ₹{balance:.2f}**
+💰 **Your Current Balance: ₹{{balance:.2f}}**
 
 Keep chatting to earn ₹{CHAT_PAY_RATE} per message!
 Use /balance to check your earnings anytime.
 
 Ready to chat and earn? Let's go! 🚀
 """
-        
-        # Create inline keyboard
-        keyboard = [
-            [InlineKeyboardButton("💰 Check Balance", callback_data='balance')],
-            [InlineKeyboardButton("👤 My Profile", callback_data='profile')],
-            [InlineKeyboardButton("🎁 Refer Friends", callback_data='referral')],
-            [InlineKeyboardButton("📞 Support", url=f"https://t.me/{SUPPORT_USERNAME.replace('@', '')}")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(welcome_message, parse_mode='Markdown', reply_markup=reply_markup)
-        
-    except Exception as e:
-        logger.error(f"Start command error: {e}")
-        await update.message.reply_text("Sorry, something went wrong. Please try again.")
 
-async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /balance command"""
-    try:
-        telegram_id = update.effective_user.id
-        user_data = get_user(telegram_id)
-        
-        if not user_data:
-            await update.message.reply_text("Please use /start first to register.")
-            return
-        
-        balance = user_data[5]
-        total_earned = user_data[6]
-        
-        # Add visit bonus
-        add_earnings(telegram_id, VISIT_PAY_RATE, "Balance check bonus")
-        
-        balance_message = f"""
+_BALANCE_TMPL = f"""
 💰 **Your Earnings Summary**
 
-**Current Balance:** ₹{balance:.2f}
-**Total Earned:** ₹{total_earned:.2f}
+**Current Balance:** ₹{{balance:.2f}}
+**Total Earned:** ₹{{total_earned:.2f}}
 **Earning Rate:** ₹{CHAT_PAY_RATE} per message
 
 💸 **How to Earn More:**
@@ -357,75 +565,29 @@ async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 Keep chatting to increase your earnings! 🚀
 """
-        
-        keyboard = [
-            [InlineKeyboardButton("🔄 Refresh Balance", callback_data='balance')],
-            [InlineKeyboardButton("💸 Withdrawal Info", callback_data='withdrawal')],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(balance_message, parse_mode='Markdown', reply_markup=reply_markup)
-        
-    except Exception as e:
-        logger.error(f"Balance command error: {e}")
-        await update.message.reply_text("Error checking balance. Please try again.")
 
-async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /profile command"""
-    try:
-        user = update.effective_user
-        telegram_id = user.id
-        user_data = get_user(telegram_id)
-        
-        if not user_data:
-            await update.message.reply_text("Please use /start first to register.")
-            return
-        
-        # Add visit bonus
-        add_earnings(telegram_id, VISIT_PAY_RATE, "Profile view bonus")
-        
-        profile_message = f"""
+_PROFILE_TMPL = """
 👤 **Your Profile**
 
-**Name:** {user.first_name} {user.last_name or ''}
-**Username:** @{user.username or 'Not set'}
+**Name:** {first_name} {last_name}
+**Username:** @{username}
 **Telegram ID:** {telegram_id}
 
 **Account Info:**
-• Balance: ₹{user_data[5]:.2f}
-• Total Earned: ₹{user_data[6]:.2f}
-• Referral Code: `{user_data[7]}`
-• Member Since: {user_data[9][:10]}
+• Balance: ₹{balance:.2f}
+• Total Earned: ₹{total_earned:.2f}
+• Referral Code: `{referral_code}`
+• Member Since: {created_at}
 
 **Earning Stats:**
 • Messages Sent: Check with /stats
 • Referrals Made: Coming soon
-• Last Active: {user_data[10][:16]}
+• Last Active: {last_active}
 
 Share your referral code to earn ₹10 per friend! 🎁
 """
-        
-        keyboard = [
-            [InlineKeyboardButton("🎁 Share Referral Code", callback_data='referral')],
-            [InlineKeyboardButton("📊 View Stats", callback_data='stats')],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(profile_message, parse_mode='Markdown', reply_markup=reply_markup)
-        
-    except Exception as e:
-        logger.error(f"Profile command error: {e}")
-        await update.message.reply_text("Error loading profile. Please try again.")
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /help command"""
-    try:
-        telegram_id = update.effective_user.id
-        
-        # Add visit bonus
-        add_earnings(telegram_id, VISIT_PAY_RATE, "Help command bonus")
-        
-        help_message = f"""
+_HELP_MSG = f"""
 🤖 **Ganesh A.I. Help Center**
 
 **Available Commands:**
@@ -454,14 +616,191 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 Just send me any message to start earning! 🚀
 """
+
+_BALANCE_UPDATED_TMPL = """
+💰 **Balance Updated**
+
+Current Balance: ₹{balance:.2f}
+Total Earned: ₹{total_earned:.2f}
+
+Keep chatting to earn more! 🚀
+"""
+
+_PROFILE_INFO_TMPL = """
+👤 **Profile Info**
+
+Balance: ₹{balance:.2f}
+Total Earned: ₹{total_earned:.2f}
+Referral Code: `{referral_code}`
+
+Share your code to earn ₹10 per friend!
+"""
+
+_REFERRAL_TMPL = """
+🎁 **Referral Program**
+
+Your Referral Code: `{referral_code}`
+
+**How it works:**
+1. Share this code with friends
+2. They use /start and mention your code
+3. You both get ₹10 bonus!
+
+**Share Message:**
+"Join Ganesh A.I. and earn money by chatting! Use my referral code: {referral_code} 
+Start here: @{bot_username}"
+
+Unlimited referrals = Unlimited earnings! 💸
+"""
+
+_WITHDRAW_MSG = f"""
+💸 **Withdrawal Information**
+
+**UPI ID:** {UPI_ID}
+**Minimum Withdrawal:** ₹50
+**Processing Time:** 24-48 hours
+
+**How to Withdraw:**
+1. Reach minimum balance (₹50)
+2. Contact support: {SUPPORT_USERNAME}
+3. Provide your UPI ID
+4. Get paid within 48 hours!
+
+**Support Contact:** {SUPPORT_USERNAME}
+"""
+
+_STATS_TMPL = """
+📊 **Your Statistics**
+
+**Messages Sent:** {total_messages}
+**Transactions:** {total_transactions}
+**Total Earned:** ₹{total_earned:.2f}
+**Current Balance:** ₹{balance:.2f}
+**Member Since:** {created_at}
+
+**Average per Message:** ₹{average:.3f}
+
+Keep chatting to improve your stats! 📈
+"""
+
+_SUPPORT_URL = f"https://t.me/{SUPPORT_USERNAME.lstrip('@')}"
+_SUPPORT_BTN = InlineKeyboardButton("📞 Support", url=_SUPPORT_URL)
+
+_KB_START = InlineKeyboardMarkup([
+    [InlineKeyboardButton("💰 Check Balance", callback_data='balance')],
+    [InlineKeyboardButton("👤 My Profile", callback_data='profile')],
+    [InlineKeyboardButton("🎁 Refer Friends", callback_data='referral')],
+    [_SUPPORT_BTN],
+])
+
+_KB_BALANCE = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔄 Refresh Balance", callback_data='balance')],
+    [InlineKeyboardButton("💸 Withdrawal Info", callback_data='withdrawal')],
+])
+
+_KB_PROFILE = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎁 Share Referral Code", callback_data='referral')],
+    [InlineKeyboardButton("📊 View Stats", callback_data='stats')],
+])
+
+_KB_HELP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("💰 Check Balance", callback_data='balance')],
+    [InlineKeyboardButton("📞 Contact Support", url=_SUPPORT_URL)],
+])
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /start command"""
+    try:
+        user = update.effective_user
+        telegram_id = user.id
         
-        keyboard = [
-            [InlineKeyboardButton("💰 Check Balance", callback_data='balance')],
-            [InlineKeyboardButton("📞 Contact Support", url=f"https://t.me/{SUPPORT_USERNAME.replace('@', '')}")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Check if user exists
+        existing_user = await _db(get_user, telegram_id)
         
-        await update.message.reply_text(help_message, parse_mode='Markdown', reply_markup=reply_markup)
+        if not existing_user:
+            # Create new user
+            await _db(create_user, telegram_id, user.username, user.first_name, user.last_name)
+            
+            welcome_message = _WELCOME_NEW_TMPL.format(first_name=user.first_name)
+        else:
+            # Add visit bonus
+            balance = await _maybe_visit_bonus(telegram_id, "Bot visit bonus")
+            if balance is None:
+                balance = existing_user['balance']
+            
+            welcome_message = _WELCOME_BACK_TMPL.format(first_name=user.first_name, balance=balance)
+        
+        await update.message.reply_text(welcome_message, parse_mode='Markdown', reply_markup=_KB_START)
+        
+    except Exception as e:
+        logger.error(f"Start command error: {e}")
+        await update.message.reply_text("Sorry, something went wrong. Please try again.")
+
+async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /balance command"""
+    try:
+        telegram_id = update.effective_user.id
+        user_data = await _db(get_user, telegram_id)
+        
+        if not user_data:
+            await update.message.reply_text("Please use /start first to register.")
+            return
+        
+        # Add visit bonus
+        await _maybe_visit_bonus(telegram_id, "Balance check bonus")
+        
+        balance_message = _BALANCE_TMPL.format(
+            balance=user_data['balance'],
+            total_earned=user_data['total_earned']
+        )
+        
+        await update.message.reply_text(balance_message, parse_mode='Markdown', reply_markup=_KB_BALANCE)
+        
+    except Exception as e:
+        logger.error(f"Balance command error: {e}")
+        await update.message.reply_text("Error checking balance. Please try again.")
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /profile command"""
+    try:
+        user = update.effective_user
+        telegram_id = user.id
+        user_data = await _db(get_user, telegram_id)
+        
+        if not user_data:
+            await update.message.reply_text("Please use /start first to register.")
+            return
+        
+        # Add visit bonus
+        await _maybe_visit_bonus(telegram_id, "Profile view bonus")
+        
+        profile_message = _PROFILE_TMPL.format(
+            first_name=user.first_name,
+            last_name=user.last_name or '',
+            username=user.username or 'Not set',
+            telegram_id=telegram_id,
+            balance=user_data['balance'],
+            total_earned=user_data['total_earned'],
+            referral_code=user_data['referral_code'],
+            created_at=user_data['created_at'][:10],
+            last_active=user_data['last_active'][:16]
+        )
+        
+        await update.message.reply_text(profile_message, parse_mode='Markdown', reply_markup=_KB_PROFILE)
+        
+    except Exception as e:
+        logger.error(f"Profile command error: {e}")
+        await update.message.reply_text("Error loading profile. Please try again.")
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /help command"""
+    try:
+        telegram_id = update.effective_user.id
+        
+        # Add visit bonus
+        await _maybe_visit_bonus(telegram_id, "Help command bonus")
+        
+        await update.message.reply_text(_HELP_MSG, parse_mode='Markdown', reply_markup=_KB_HELP)
         
     except Exception as e:
         logger.error(f"Help command error: {e}")
@@ -475,41 +814,39 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message_text = update.message.text
         
         # Check if user exists
-        user_data = get_user(telegram_id)
+        user_data = await _db(get_user, telegram_id)
         if not user_data:
             await update.message.reply_text("Please use /start first to register and get your welcome bonus!")
             return
         
-        # Get AI response
-        ai_response = get_ai_response(message_text)
+        # Stream the AI response: the first chunk is sent as a reply, later chunks edit it
+        sent = None
         
-        # Add earnings
-        add_earnings(telegram_id, CHAT_PAY_RATE, f"Chat message: {message_text[:30]}...")
+        async def show_partial(text):
+            nonlocal sent
+            try:
+                if sent is None:
+                    sent = await update.message.reply_text(text)
+                else:
+                    await sent.edit_text(text)
+            except Exception as e:
+                logger.warning(f"Partial reply update failed: {e}")
         
-        # Save chat to database
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO bot_chats (telegram_id, message, response, model_used, earnings)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (telegram_id, message_text, ai_response, OPENAI_MODEL, CHAT_PAY_RATE))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logger.error(f"Error saving chat: {e}")
+        ai_response = await get_ai_response(message_text, on_partial=show_partial)
         
-        # Get updated balance
-        updated_user = get_user(telegram_id)
-        new_balance = updated_user[5] if updated_user else 0.0
+        # Credit earnings; the chat log row is written later by the batch flusher
+        new_balance = await _db(add_earnings, telegram_id, CHAT_PAY_RATE, f"Chat message: {message_text[:30]}...")
+        if new_balance is None:
+            new_balance = user_data['balance']
+        _chat_queue.put_nowait((telegram_id, message_text, ai_response, OPENAI_MODEL, CHAT_PAY_RATE))
         
-        # Send AI response with earnings info
-        response_message = f"{ai_response}\n\n💰 **Earned: ₹{CHAT_PAY_RATE}** | Balance: ₹{new_balance:.2f}"
+        # Send AI response with earnings info; HTML-escaped since the model's text is arbitrary
+        response_message = f"{html.escape(ai_response)}\n\n💰 <b>Earned: ₹{CHAT_PAY_RATE}</b> | Balance: ₹{new_balance:.2f}"
         
-        await update.message.reply_text(response_message, parse_mode='Markdown')
+        if sent is None:
+            await update.message.reply_text(response_message, parse_mode='HTML')
+        else:
+            await sent.edit_text(response_message, parse_mode='HTML')
         
     except Exception as e:
         logger.error(f"Message handling error: {e}")
@@ -525,115 +862,126 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         data = query.data
         
         if data == 'balance':
-            user_data = get_user(telegram_id)
+            user_data = await _db(get_user, telegram_id)
             if user_data:
-                balance = user_data[5]
-                total_earned = user_data[6]
-                
-                balance_text = f"""
-💰 **Balance Updated**
-
-Current Balance: ₹{balance:.2f}
-Total Earned: ₹{total_earned:.2f}
-
-Keep chatting to earn more! 🚀
-"""
+                balance_text = _BALANCE_UPDATED_TMPL.format(
+                    balance=user_data['balance'],
+                    total_earned=user_data['total_earned']
+                )
                 await query.edit_message_text(balance_text, parse_mode='Markdown')
         
         elif data == 'profile':
-            user_data = get_user(telegram_id)
+            user_data = await _db(get_user, telegram_id)
             if user_data:
-                profile_text = f"""
-👤 **Profile Info**
-
-Balance: ₹{user_data[5]:.2f}
-Total Earned: ₹{user_data[6]:.2f}
-Referral Code: `{user_data[7]}`
-
-Share your code to earn ₹10 per friend!
-"""
+                profile_text = _PROFILE_INFO_TMPL.format(
+                    balance=user_data['balance'],
+                    total_earned=user_data['total_earned'],
+                    referral_code=user_data['referral_code']
+                )
                 await query.edit_message_text(profile_text, parse_mode='Markdown')
         
         elif data == 'referral':
-            user_data = get_user(telegram_id)
+            user_data = await _db(get_user, telegram_id)
             if user_data:
-                referral_text = f"""
-🎁 **Referral Program**
-
-Your Referral Code: `{user_data[7]}`
-
-**How it works:**
-1. Share this code with friends
-2. They use /start and mention your code
-3. You both get ₹10 bonus!
-
-**Share Message:**
-"Join Ganesh A.I. and earn money by chatting! Use my referral code: {user_data[7]} 
-Start here: @{context.bot.username}"
-
-Unlimited referrals = Unlimited earnings! 💸
-"""
+                referral_text = _REFERRAL_TMPL.format(
+                    referral_code=user_data['referral_code'],
+                    bot_username=context.bot.username
+                )
                 await query.edit_message_text(referral_text, parse_mode='Markdown')
         
         elif data == 'withdrawal':
-            withdrawal_text = f"""
-💸 **Withdrawal Information**
-
-**UPI ID:** {UPI_ID}
-**Minimum Withdrawal:** ₹50
-**Processing Time:** 24-48 hours
-
-**How to Withdraw:**
-1. Reach minimum balance (₹50)
-2. Contact support: {SUPPORT_USERNAME}
-3. Provide your UPI ID
-4. Get paid within 48 hours!
-
-**Support Contact:** {SUPPORT_USERNAME}
-"""
-            await query.edit_message_text(withdrawal_text, parse_mode='Markdown')
+            await query.edit_message_text(_WITHDRAW_MSG, parse_mode='Markdown')
         
         elif data == 'stats':
             # Get user stats
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT COUNT(*) FROM bot_chats WHERE telegram_id = ?', (telegram_id,))
-            total_messages = cursor.fetchone()[0]
+            total_messages, total_transactions = await _db(get_user_stats, telegram_id)
             
-            cursor.execute('SELECT COUNT(*) FROM bot_transactions WHERE telegram_id = ? AND type = "earning"', (telegram_id,))
-            total_transactions = cursor.fetchone()[0]
-            
-            conn.close()
-            
-            user_data = get_user(telegram_id)
+            user_data = await _db(get_user, telegram_id)
             if user_data:
-                stats_text = f"""
-📊 **Your Statistics**
-
-**Messages Sent:** {total_messages}
-**Transactions:** {total_transactions}
-**Total Earned:** ₹{user_data[6]:.2f}
-**Current Balance:** ₹{user_data[5]:.2f}
-**Member Since:** {user_data[9][:10]}
-
-**Average per Message:** ₹{user_data[6]/total_messages if total_messages > 0 else 0:.3f}
-
-Keep chatting to improve your stats! 📈
-"""
+                stats_text = _STATS_TMPL.format(
+                    total_messages=total_messages,
+                    total_transactions=total_transactions,
+                    total_earned=user_data['total_earned'],
+                    balance=user_data['balance'],
+                    created_at=user_data['created_at'][:10],
+                    average=user_data['total_earned'] / total_messages if total_messages > 0 else 0
+                )
                 await query.edit_message_text(stats_text, parse_mode='Markdown')
         
     except Exception as e:
         logger.error(f"Callback handling error: {e}")
 
+async def _chat_flusher():
+    """Write queued chat rows in batches until a None sentinel is received"""
+    while True:
+        batch = [await _chat_queue.get()]
+        if _chat_queue.qsize() + 1 < CHAT_FLUSH_SIZE:
+            # Give the batch time to fill unless it is already full
+            await asyncio.sleep(CHAT_FLUSH_INTERVAL)
+        while len(batch) < CHAT_FLUSH_SIZE and not _chat_queue.empty():
+            batch.append(_chat_queue.get_nowait())
+        
+        stop = None in batch
+        rows = [row for row in batch if row is not None]
+        if rows:
+            try:
+                await _db(save_chats, rows)
+            except Exception as e:
+                logger.error(f"Error saving chats: {e}")
+        if stop:
+            return
+
+async def _warm_openai_connection():
+    """Open a pooled TLS connection to OpenAI before the first user message"""
+    if not (OPENAI_API_KEY and OPENAI_API_KEY.startswith('sk-')):
+        return
+    try:
+        await _HTTP.get(
+            'https://api.openai.com/v1/models',
+            headers={'Authorization': f'Bearer {OPENAI_API_KEY}'},
+            timeout=5
+        )
+        logger.info("✅ OpenAI connection warmed up")
+    except Exception as e:
+        logger.warning(f"OpenAI warm-up failed: {e}")
+
+async def _post_init(application):
+    """Start background tasks once the event loop is running"""
+    global _chat_flush_task
+    _chat_flush_task = asyncio.create_task(_chat_flusher())
+    await _warm_openai_connection()
+
+async def _post_shutdown(application):
+    """Flush pending chats and close the shared HTTP client"""
+    if _chat_flush_task is not None:
+        _chat_queue.put_nowait(None)
+        await _chat_flush_task
+    await _HTTP.aclose()
+
 def main():
     """Main function to run the bot"""
     try:
         # Initialize database
         init_bot_db()
         
+        # Use the libuv-based event loop when available (not on Windows).
+        # uvloop's policy doesn't create a loop on demand, so set one for
+        # run_polling's get_event_loop()
+        try:
+            import uvloop
+            uvloop.install()
+            asyncio.set_event_loop(asyncio.new_event_loop())
+        except ImportError:
+            pass
+        
         # Create application
-        application = Application.builder().token(TELEGRAM_TOKEN).build()
+        application = (
+            Application.builder()
+            .token(TELEGRAM_TOKEN)
+            .post_init(_post_init)
+            .post_shutdown(_post_shutdown)
+            .build()
+        )
         
         # Add handlers
         application.add_handler(CommandHandler("start", start_command))
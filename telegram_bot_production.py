@@ -6,21 +6,35 @@ Standalone Telegram bot with all features working
 """
 
 import os
+import re
 import sys
-import json
 import time
-import uuid
+import random
+import queue
+import atexit
+import argparse
+import signal
 import logging
 import asyncio
 import sqlite3
 import secrets
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime
+from urllib.parse import urlparse
 
-from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.helpers import escape_markdown
+from telegram.request import HTTPXRequest
 from dotenv import load_dotenv
-import requests
+import aiosqlite
+import httpx
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # Load environment
 load_dotenv(".env")
@@ -28,6 +42,8 @@ load_dotenv(".env")
 # Configuration
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN', 'demo-telegram-token')
 WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+PORT = int(os.getenv('PORT', '8443'))
+BOT_CPU = os.getenv('BOT_CPU')
 APP_NAME = os.getenv('APP_NAME', 'Ganesh A.I.')
 DOMAIN = os.getenv('DOMAIN', 'https://ganesh-ai.onrender.com')
 CHAT_PAY_RATE = float(os.getenv('CHAT_PAY_RATE', '0.05'))
@@ -37,18 +53,280 @@ PREMIUM_YEARLY = float(os.getenv('PREMIUM_YEARLY', '999.0'))
 
 # Database file
 DB_FILE = 'telegram_bot_production.db'
+DB_READERS = 4
+
+# Chat writes are queued by handle_message and committed in batches by _flush_loop
+FLUSH_BATCH_SIZE = 100
+FLUSH_INTERVAL = 0.2
+
+# WAL checkpoint and planner statistics refresh, in seconds
+MAINTENANCE_INTERVAL = 3600
+
+# Users are cached in-process between messages
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 10000
+
+# Only message updates have handlers; long polls are held up to POLL_TIMEOUT seconds, trading
+# fewer getUpdates round trips for a connection that stays open between updates
+ALLOWED_UPDATES = [Update.MESSAGE]
+POLL_TIMEOUT = 50
+
+# Hot-path statements; passing the same strings lets each connection's statement cache reuse them
+_SQL_GET_USER = "SELECT * FROM users WHERE telegram_id = ?"
+_SQL_INSERT_USER = """
+    INSERT INTO users (telegram_id, username, first_name, last_name, referral_code, referred_by)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_SQL_REFERRAL_BONUS = """
+    UPDATE users SET balance = balance + ?, total_earned = total_earned + ?, referral_count = referral_count + 1
+    WHERE referral_code = ? RETURNING telegram_id
+"""
+_SQL_INSERT_CHAT = """
+    INSERT INTO chats (telegram_id, message, response, ai_model, tokens_used, cost, earnings)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_UPDATE_BALANCE = """
+    UPDATE users SET balance = balance + ?, total_earned = total_earned + ?, last_active = ?
+    WHERE telegram_id = ?
+"""
+_SQL_USER_BALANCE = """
+    SELECT u.*, COALESCE(a.earnings, 0.0) AS today_earnings
+    FROM users u LEFT JOIN analytics a ON a.telegram_id = u.telegram_id AND a.date = ?
+    WHERE u.telegram_id = ?
+"""
+_SQL_USER_STATS = """
+    SELECT u.*,
+        (SELECT COUNT(*) FROM chats WHERE telegram_id = u.telegram_id) AS total_chats,
+        (SELECT COUNT(*) FROM chats WHERE telegram_id = u.telegram_id AND date(created_at) = ?1) AS today_chats
+    FROM users u WHERE u.telegram_id = ?2
+"""
+
+# Adds a batch's chat count and earnings to the day's analytics row in place
+_SQL_UPSERT_ANALYTICS = """
+    INSERT INTO analytics (telegram_id, date, chats, earnings) VALUES (?, ?, ?, ?)
+    ON CONFLICT(telegram_id, date) DO UPDATE SET
+        chats = chats + excluded.chats,
+        earnings = earnings + excluded.earnings
+"""
+
+def _setup_logging():
+    """Send log records through a queue so coroutines never block on file or console writes"""
+    log_queue = queue.SimpleQueue()
+    formatter = logging.Formatter('%(asctime)s - TelegramBot - %(levelname)s - %(message)s')
+    handlers = (logging.FileHandler('telegram_bot.log'), logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.handlers = [QueueHandler(log_queue)]
+    
+    # The listener thread owns the real handlers; stopping it at exit flushes what's still queued
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - TelegramBot - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('telegram_bot.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+_setup_logging()
 logger = logging.getLogger(__name__)
 
+# Static replies are rendered once at import instead of per command
+_WELCOME_TMPL = f"""🎉 Welcome to {APP_NAME}!
+
+I'm your intelligent AI assistant. I can help you with:
+
+🤖 AI-powered conversations
+💡 Creative writing and ideas  
+🔍 Research and analysis
+💻 Coding assistance
+📚 Educational support
+🎯 Problem-solving
+
+💰 Earn money by using the bot!
+- ₹{CHAT_PAY_RATE} per chat
+- ₹{REFERRAL_BONUS} per referral
+
+Your referral code: `{{code}}`
+Share: {{link}}
+
+Type /help for more commands!"""
+_WITH_REFERRAL_SUFFIX = "\n\n🎁 You joined using a referral code! Welcome bonus applied!"
+
+def _referral_link(code):
+    """Referral link escaped for legacy Markdown; older codes can contain '_'"""
+    return escape_markdown(f"{DOMAIN}/ref/{code}")
+
+_HELP_TEXT = f"""🤖 {APP_NAME} - Help
+
+**Available Commands:**
+/start - Start the bot
+/help - Show this help message
+/premium - View premium plans
+/balance - Check your balance
+/referral - Get referral info
+/stats - View your stats
+/models - Available AI models
+/earnings - Earning information
+
+**How to Earn:**
+💬 Chat with AI: ₹{CHAT_PAY_RATE} per message
+👥 Refer friends: ₹{REFERRAL_BONUS} per referral
+⭐ Premium features available
+
+**AI Capabilities:**
+- Answer questions on any topic
+- Creative writing assistance
+- Code help and debugging
+- Research and analysis
+- Educational support
+- General conversation
+
+Just send me any message to start chatting!
+
+🌐 Web Dashboard: {DOMAIN}"""
+
+_MODELS_TEXT = f"""🤖 Available AI Models
+
+**Free Models:**
+🆓 Ganesh AI Fallback - Always available
+🆓 Basic Assistant - General queries
+
+**Premium Models:** ⭐
+🧠 GPT-4 - Advanced reasoning
+🎯 Claude 3 - Creative writing
+🚀 Gemini Pro - Multi-modal AI
+💡 GPT-4o Mini - Fast responses
+
+**Model Features:**
+✅ Instant responses
+✅ Context awareness
+✅ Multi-language support
+✅ Creative capabilities
+✅ Technical assistance
+
+Upgrade to Premium to access all models!
+Visit {DOMAIN} for more details."""
+
+_EARNINGS_TEXT = f"""💰 Earning Information
+
+**How to Earn:**
+💬 Chat Messages: ₹{CHAT_PAY_RATE} each
+👥 Referrals: ₹{REFERRAL_BONUS} each
+⭐ Premium Bonus: 2x rates
+🎁 Daily Bonuses: Available
+🏆 Challenges: Extra rewards
+
+**Premium Benefits:**
+✅ Double earning rates
+✅ Exclusive bonuses
+✅ Priority payouts
+✅ Special challenges
+
+**Payout Information:**
+💳 Minimum: ₹100
+🏦 Methods: UPI, Bank Transfer
+⏰ Processing: 24-48 hours
+🔒 Secure & Reliable
+
+Start earning today! Every chat pays! 🚀"""
+
+# Fallback replies by category
+_RNG = random.Random()
+_RESPONSES = {
+    'greeting': (
+        f"Hello! I'm {APP_NAME}, your intelligent AI assistant. How can I help you today?",
+        f"Hi there! Welcome to {APP_NAME}. What would you like to explore?",
+        "Namaste! 🙏 I'm here to assist you with any questions or tasks.",
+        "Greetings! I'm ready to help you with information, creative tasks, and much more!"
+    ),
+    'help': (
+        "I can help you with various tasks including:\n\n🤖 Answering questions on any topic\n💡 Creative writing and brainstorming\n🔍 Research and analysis\n💻 Coding assistance\n📚 Educational support\n🎯 Problem-solving\n\nJust ask me anything!",
+        "I'm equipped with advanced AI capabilities to assist with:\n\n📖 Knowledge questions\n✍️ Writing and editing\n🧮 Math and calculations\n🔬 Science explanations\n🎨 Creative projects\n💼 Business advice\n\nWhat would you like to explore?",
+        "My capabilities include:\n\n🌍 General knowledge\n📝 Content creation\n🔍 Research assistance\n💡 Idea generation\n🎓 Learning support\n🛠️ Technical help\n\nFeel free to ask me anything!"
+    ),
+    'premium': (
+        f"🌟 Premium features include:\n\n✅ Advanced AI models (GPT-4, Claude)\n✅ Unlimited conversations\n✅ Priority support\n✅ 2x earning rates\n✅ Exclusive features\n\nUpgrade for just ₹{PREMIUM_MONTHLY}/month!",
+        f"⭐ With Premium you get:\n\n🚀 Faster responses\n🧠 Smarter AI models\n💰 Double earnings\n🎯 Priority access\n🔧 Advanced tools\n\nOnly ₹{PREMIUM_YEARLY}/year (Save 17%)!"
+    ),
+    'earnings': (
+        f"💰 Earning opportunities:\n\n💬 Chat with AI: ₹{CHAT_PAY_RATE} per message\n👥 Refer friends: ₹{REFERRAL_BONUS} per referral\n⭐ Premium users earn 2x rates\n🎯 Daily bonuses available\n\nStart chatting to earn!",
+        f"🤑 Make money by:\n\n📱 Using the bot daily\n💬 Having conversations\n👨‍👩‍👧‍👦 Inviting friends\n⭐ Upgrading to premium\n🎁 Completing challenges\n\nEvery interaction pays!"
+    ),
+    'features': (
+        f"🚀 {APP_NAME} Features:\n\n🤖 Multiple AI models\n💰 Earn while you chat\n📊 Analytics dashboard\n👥 Referral program\n⭐ Premium subscriptions\n🔒 Secure & private\n\nExplore all features at {DOMAIN}",
+        f"✨ What makes us special:\n\n🧠 Advanced AI technology\n💸 Real money rewards\n📈 Track your progress\n🌐 Web & Telegram access\n🎯 Personalized experience\n🛡️ Enterprise security"
+    ),
+    'default': (
+        "That's an interesting question! Let me think about that for you.",
+        "I understand what you're asking. Here's my perspective on that topic.",
+        "Thank you for your question. I'll do my best to provide a helpful response.",
+        "Great question! Let me share some insights on that.",
+        "I appreciate you asking. Here's what I think about that.",
+        "That's a thoughtful inquiry. Let me give you a comprehensive answer.",
+        "Excellent question! I'm happy to help you with that.",
+        "I see what you're getting at. Here's my analysis of the situation."
+    )
+}
+
+# Keywords per response category, checked in priority order against the message's words
+_KEYWORDS = {
+    'greeting': frozenset({'hello', 'hi', 'hey', 'namaste', 'start'}),
+    'help': frozenset({'help', 'capabilities', 'features'}),
+    'premium': frozenset({'premium', 'upgrade', 'subscription', 'subscribe', 'plan', 'plans'}),
+    'earnings': frozenset({'earn', 'earning', 'earnings', 'money', 'payment', 'payments', 'balance', 'income'}),
+    'features': frozenset({'feature', 'about'})
+}
+# Multi-word phrases are matched as substrings and rank with their own category
+_KEYWORD_PHRASES = {
+    'help': ('what can you do',),
+    'features': ('what is',)
+}
+_WORD_RE = re.compile(r"\w+")
+
+def _build_keyword_automaton():
+    """Compile every keyword and phrase into one Aho-Corasick automaton"""
+    automaton = ahocorasick.Automaton()
+    for rank, (category, keywords) in enumerate(_KEYWORDS.items()):
+        for keyword in keywords:
+            automaton.add_word(keyword, (rank, category, len(keyword), True))
+        for phrase in _KEYWORD_PHRASES.get(category, ()):
+            automaton.add_word(phrase, (rank, category, len(phrase), False))
+    automaton.make_automaton()
+    return automaton
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+# Single-pass keyword scan when pyahocorasick is installed
+_AC = _build_keyword_automaton() if ahocorasick else None
+
+def _message_category(message_lower):
+    """Pick the fallback response category for a lowercased message"""
+    if _AC is not None:
+        best_rank, best_category = None, 'default'
+        last = len(message_lower) - 1
+        for end, (rank, category, length, whole_word) in _AC.iter(message_lower):
+            if best_rank is not None and rank >= best_rank:
+                continue
+            start = end - length + 1
+            # Single keywords only count as whole words, matching the word-set path below
+            if whole_word and (
+                (start > 0 and _is_word_char(message_lower[start - 1]))
+                or (end < last and _is_word_char(message_lower[end + 1]))
+            ):
+                continue
+            best_rank, best_category = rank, category
+            if rank == 0:
+                break
+        return best_category
+    
+    words = frozenset(_WORD_RE.findall(message_lower))
+    for category, keywords in _KEYWORDS.items():
+        if not keywords.isdisjoint(words) or any(
+            phrase in message_lower for phrase in _KEYWORD_PHRASES.get(category, ())
+        ):
+            return category
+    return 'default'
+
 class TelegramBotProduction:
     """Production-ready Telegram bot with all features"""
     
@@ -56,15 +334,40 @@ class TelegramBotProduction:
         self.token = TELEGRAM_TOKEN
         self.bot = None
         self.application = None
-        self.db_connection = None
         
         # Initialize database
         self.init_database()
         
+        # aiosqlite connections are opened on startup: one writer plus a pool of readers
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._readers = asyncio.Queue()
+        
+        self._write_queue = asyncio.Queue()
+        self._flush_task = None
+        self._maintenance_task = None
+        self._user_cache: dict[str, tuple[dict, float]] = {}
+        
+        # Shared keep-alive HTTP/2 client for outbound AI API calls
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=3.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            http2=True
+        )
+        
         # Setup bot if token is available
         if self.token and self.token != 'demo-telegram-token':
-            self.bot = Bot(token=self.token)
-            self.application = Application.builder().token(self.token).build()
+            self.application = (
+                Application.builder()
+                .token(self.token)
+                # Multiplex API calls over HTTP/2; getUpdates gets its own single-connection pool
+                # so a held long poll never blocks replies
+                .request(HTTPXRequest(http_version='2', connection_pool_size=256))
+                .get_updates_request(HTTPXRequest(http_version='2', connection_pool_size=1))
+                .build()
+            )
+            # Share the application's Bot so webhook calls use its initialized client on the running loop
+            self.bot = self.application.bot
             self._setup_handlers()
         else:
             logger.warning("⚠️ Demo token detected. Bot will work in demo mode.")
@@ -77,6 +380,14 @@ class TelegramBotProduction:
             conn = sqlite3.connect(DB_FILE)
             cursor = conn.cursor()
             
+            # page_size only applies to a new database, so it must run before any table exists
+            cursor.execute("PRAGMA page_size=8192")
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA mmap_size=268435456")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA wal_autocheckpoint=1000")
+            
             # Create users table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
@@ -92,10 +403,21 @@ class TelegramBotProduction:
                     is_premium BOOLEAN DEFAULT FALSE,
                     premium_expires TEXT,
                     created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    last_active TEXT DEFAULT CURRENT_TIMESTAMP
+                    last_active TEXT DEFAULT CURRENT_TIMESTAMP,
+                    referral_count INTEGER DEFAULT 0
                 )
             ''')
             
+            # Older databases predate the maintained referral counter; add and backfill it
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(users)")}
+            if 'referral_count' not in columns:
+                cursor.execute("ALTER TABLE users ADD COLUMN referral_count INTEGER DEFAULT 0")
+                cursor.execute('''
+                    UPDATE users SET referral_count = (
+                        SELECT COUNT(*) FROM users AS referred WHERE referred.referred_by = users.referral_code
+                    )
+                ''')
+            
             # Create chats table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS chats (
@@ -123,6 +445,10 @@ class TelegramBotProduction:
                 )
             ''')
             
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_referred_by ON users(referred_by)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_chats_tid_date ON chats(telegram_id, date(created_at))")
+            cursor.execute("ANALYZE")
+            
             conn.commit()
             conn.close()
             logger.info("✅ Database initialized successfully")
@@ -130,9 +456,148 @@ class TelegramBotProduction:
         except Exception as e:
             logger.error(f"❌ Database initialization error: {str(e)}")
     
-    def get_db_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(DB_FILE)
+    async def _open_connection(self):
+        """Open a tuned aiosqlite connection"""
+        conn = await aiosqlite.connect(DB_FILE, isolation_level=None, cached_statements=256)
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute("PRAGMA temp_store=MEMORY")
+        await conn.execute("PRAGMA cache_size=-20000")
+        await conn.execute("PRAGMA mmap_size=268435456")
+        conn.row_factory = aiosqlite.Row
+        return conn
+    
+    async def _open_db(self):
+        """Open the writer and reader connections if they aren't open yet"""
+        if self._writer is not None:
+            return
+        self._writer = await self._open_connection()
+        for _ in range(DB_READERS):
+            self._readers.put_nowait(await self._open_connection())
+    
+    async def _close_db(self):
+        """Close every database connection"""
+        if self._writer is None:
+            return
+        while not self._readers.empty():
+            await self._readers.get_nowait().close()
+        await self._writer.close()
+        self._writer = None
+    
+    @asynccontextmanager
+    async def get_db(self):
+        """Borrow a reader connection"""
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+    
+    @asynccontextmanager
+    async def _write_transaction(self):
+        """Run statements on the writer connection inside BEGIN IMMEDIATE ... COMMIT"""
+        async with self._write_lock:
+            await self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                # A failed COMMIT can leave the transaction open; roll back before releasing the lock
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+                raise
+    
+    async def _write_batch(self, batch):
+        """Commit a batch of queued chats, balance changes and analytics in one transaction"""
+        balances = {}
+        analytics = {}
+        for item in batch:
+            earned, last_active = balances.get(item['telegram_id'], (0.0, ''))
+            balances[item['telegram_id']] = (earned + item['earnings'], max(last_active, item['last_active']))
+            
+            key = (item['telegram_id'], item['date'])
+            chats, earnings = analytics.get(key, (0, 0.0))
+            analytics[key] = (chats + 1, earnings + item['earnings'])
+        
+        async with self._write_transaction() as conn:
+            await conn.executemany(_SQL_INSERT_CHAT, [
+                (item['telegram_id'], item['message'], item['response'], item['model'],
+                 item['tokens'], item['cost'], item['earnings'])
+                for item in batch
+            ])
+            
+            await conn.executemany(_SQL_UPDATE_BALANCE, [
+                (earned, earned, last_active, telegram_id)
+                for telegram_id, (earned, last_active) in balances.items()
+            ])
+            
+            await conn.executemany(_SQL_UPSERT_ANALYTICS, [
+                (telegram_id, date, chats, earnings)
+                for (telegram_id, date), (chats, earnings) in analytics.items()
+            ])
+        
+        # Balances changed underneath the cached rows
+        for telegram_id in balances:
+            self._user_cache.pop(telegram_id, None)
+    
+    async def _flush_loop(self):
+        """Hand queued chats to _write_batch() until _post_shutdown() enqueues None"""
+        while True:
+            item = await self._write_queue.get()
+            if item is not None and self._write_queue.qsize() < FLUSH_BATCH_SIZE - 1:
+                # Wait a moment so a burst of messages shares one writer transaction
+                await asyncio.sleep(FLUSH_INTERVAL)
+            
+            items = []
+            while item is not None:
+                items.append(item)
+                if len(items) == FLUSH_BATCH_SIZE or self._write_queue.empty():
+                    break
+                item = self._write_queue.get_nowait()
+            
+            if items:
+                try:
+                    await self._write_batch(items)
+                except Exception as e:
+                    logger.error(f"Batch write error: {str(e)}")
+            if item is None:
+                return
+    
+    async def _maintenance_loop(self):
+        """Truncate the WAL and refresh query planner statistics every MAINTENANCE_INTERVAL"""
+        while True:
+            await asyncio.sleep(MAINTENANCE_INTERVAL)
+            try:
+                async with self._write_lock:
+                    await self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    await self._writer.execute("ANALYZE")
+                logger.info("🧹 Database maintenance complete")
+            except Exception as e:
+                logger.error(f"Database maintenance error: {str(e)}")
+    
+    async def _start_background_tasks(self):
+        """Open the database and start the background tasks if they aren't running yet"""
+        await self._open_db()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+    
+    async def _post_init(self, application):
+        """Start background tasks once the event loop is running"""
+        await self._start_background_tasks()
+    
+    async def _post_shutdown(self, application):
+        """Flush pending writes, close the database and the HTTP client before the bot exits"""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        if self._flush_task is not None:
+            self._write_queue.put_nowait(None)
+            await self._flush_task
+            self._flush_task = None
+        await self._close_db()
+        await self._http.aclose()
     
     def _setup_handlers(self):
         """Setup bot command and message handlers"""
@@ -155,69 +620,68 @@ class TelegramBotProduction:
         logger.info("✅ Bot handlers setup complete")
     
     def generate_referral_code(self):
-        """Generate unique referral code"""
-        while True:
-            code = secrets.token_urlsafe(8)[:8].upper()
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM users WHERE referral_code = ?", (code,))
-            if not cursor.fetchone():
-                conn.close()
-                return code
-            conn.close()
+        """Generate a referral code; uniqueness is enforced by the users table"""
+        return secrets.token_urlsafe(6).upper().replace('_', 'A').replace('-', 'B')[:8]
     
-    def get_or_create_user(self, telegram_user, referral_code=None):
+    def _cache_user(self, telegram_id, user):
+        """Cache a user row for USER_CACHE_TTL seconds"""
+        now = time.monotonic()
+        if len(self._user_cache) >= USER_CACHE_SIZE:
+            self._user_cache = {
+                key: entry for key, entry in self._user_cache.items() if entry[1] > now
+            }
+            if len(self._user_cache) >= USER_CACHE_SIZE:
+                self._user_cache.clear()
+        user = dict(user)
+        self._user_cache[telegram_id] = (user, now + USER_CACHE_TTL)
+        return user
+    
+    async def get_or_create_user(self, telegram_user, referral_code=None):
         """Get or create user in database"""
         try:
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            
             telegram_id = str(telegram_user.id)
             
-            # Check if user exists
-            cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-            user = cursor.fetchone()
+            cached = self._user_cache.get(telegram_id)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+            
+            # Check if user exists; last_active is written by the batch flusher
+            async with self.get_db() as conn:
+                async with conn.execute(_SQL_GET_USER, (telegram_id,)) as cursor:
+                    user = await cursor.fetchone()
             
             if user:
-                # Update last active
-                cursor.execute(
-                    "UPDATE users SET last_active = ? WHERE telegram_id = ?",
-                    (datetime.utcnow().isoformat(), telegram_id)
-                )
-                conn.commit()
-                conn.close()
-                return dict(zip([col[0] for col in cursor.description], user))
-            else:
-                # Create new user
-                new_referral_code = self.generate_referral_code()
-                
-                cursor.execute('''
-                    INSERT INTO users (telegram_id, username, first_name, last_name, referral_code, referred_by)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    telegram_id,
-                    telegram_user.username or f"user_{telegram_user.id}",
-                    telegram_user.first_name or "",
-                    telegram_user.last_name or "",
-                    new_referral_code,
-                    referral_code
-                ))
+                return self._cache_user(telegram_id, user)
+            
+            # Create new user
+            async with self._write_transaction() as conn:
+                # Retry only on the rare referral code collision
+                while True:
+                    try:
+                        await conn.execute(_SQL_INSERT_USER, (
+                            telegram_id,
+                            telegram_user.username or f"user_{telegram_user.id}",
+                            telegram_user.first_name or "",
+                            telegram_user.last_name or "",
+                            self.generate_referral_code(),
+                            referral_code
+                        ))
+                        break
+                    except sqlite3.IntegrityError as e:
+                        if 'referral_code' not in str(e):
+                            raise
                 
                 # Handle referral bonus
                 if referral_code:
-                    cursor.execute(
-                        "UPDATE users SET balance = balance + ?, total_earned = total_earned + ? WHERE referral_code = ?",
-                        (REFERRAL_BONUS, REFERRAL_BONUS, referral_code)
-                    )
-                
-                conn.commit()
+                    async with conn.execute(_SQL_REFERRAL_BONUS, (REFERRAL_BONUS, REFERRAL_BONUS, referral_code)) as cursor:
+                        for row in await cursor.fetchall():
+                            self._user_cache.pop(row['telegram_id'], None)
                 
                 # Get the created user
-                cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-                user = cursor.fetchone()
-                conn.close()
-                
-                return dict(zip([col[0] for col in cursor.description], user))
+                async with conn.execute(_SQL_GET_USER, (telegram_id,)) as cursor:
+                    user = await cursor.fetchone()
+            
+            return self._cache_user(telegram_id, user)
                 
         except Exception as e:
             logger.error(f"User creation error: {str(e)}")
@@ -227,62 +691,11 @@ class TelegramBotProduction:
         """Generate AI response with fallback system"""
         try:
             # For demo purposes, we'll use a comprehensive fallback system
-            # In production, you would integrate with actual AI APIs
-            
-            responses = {
-                'greeting': [
-                    f"Hello! I'm {APP_NAME}, your intelligent AI assistant. How can I help you today?",
-                    f"Hi there! Welcome to {APP_NAME}. What would you like to explore?",
-                    "Namaste! 🙏 I'm here to assist you with any questions or tasks.",
-                    "Greetings! I'm ready to help you with information, creative tasks, and much more!"
-                ],
-                'help': [
-                    "I can help you with various tasks including:\n\n🤖 Answering questions on any topic\n💡 Creative writing and brainstorming\n🔍 Research and analysis\n💻 Coding assistance\n📚 Educational support\n🎯 Problem-solving\n\nJust ask me anything!",
-                    "I'm equipped with advanced AI capabilities to assist with:\n\n📖 Knowledge questions\n✍️ Writing and editing\n🧮 Math and calculations\n🔬 Science explanations\n🎨 Creative projects\n💼 Business advice\n\nWhat would you like to explore?",
-                    "My capabilities include:\n\n🌍 General knowledge\n📝 Content creation\n🔍 Research assistance\n💡 Idea generation\n🎓 Learning support\n🛠️ Technical help\n\nFeel free to ask me anything!"
-                ],
-                'premium': [
-                    f"🌟 Premium features include:\n\n✅ Advanced AI models (GPT-4, Claude)\n✅ Unlimited conversations\n✅ Priority support\n✅ 2x earning rates\n✅ Exclusive features\n\nUpgrade for just ₹{PREMIUM_MONTHLY}/month!",
-                    f"⭐ With Premium you get:\n\n🚀 Faster responses\n🧠 Smarter AI models\n💰 Double earnings\n🎯 Priority access\n🔧 Advanced tools\n\nOnly ₹{PREMIUM_YEARLY}/year (Save 17%)!"
-                ],
-                'earnings': [
-                    f"💰 Earning opportunities:\n\n💬 Chat with AI: ₹{CHAT_PAY_RATE} per message\n👥 Refer friends: ₹{REFERRAL_BONUS} per referral\n⭐ Premium users earn 2x rates\n🎯 Daily bonuses available\n\nStart chatting to earn!",
-                    f"🤑 Make money by:\n\n📱 Using the bot daily\n💬 Having conversations\n👨‍👩‍👧‍👦 Inviting friends\n⭐ Upgrading to premium\n🎁 Completing challenges\n\nEvery interaction pays!"
-                ],
-                'features': [
-                    f"🚀 {APP_NAME} Features:\n\n🤖 Multiple AI models\n💰 Earn while you chat\n📊 Analytics dashboard\n👥 Referral program\n⭐ Premium subscriptions\n🔒 Secure & private\n\nExplore all features at {DOMAIN}",
-                    f"✨ What makes us special:\n\n🧠 Advanced AI technology\n💸 Real money rewards\n📈 Track your progress\n🌐 Web & Telegram access\n🎯 Personalized experience\n🛡️ Enterprise security"
-                ],
-                'default': [
-                    "That's an interesting question! Let me think about that for you.",
-                    "I understand what you're asking. Here's my perspective on that topic.",
-                    "Thank you for your question. I'll do my best to provide a helpful response.",
-                    "Great question! Let me share some insights on that.",
-                    "I appreciate you asking. Here's what I think about that.",
-                    "That's a thoughtful inquiry. Let me give you a comprehensive answer.",
-                    "Excellent question! I'm happy to help you with that.",
-                    "I see what you're getting at. Here's my analysis of the situation."
-                ]
-            }
+            # In production, you would integrate with actual AI APIs via self._http
             
-            message_lower = message.lower()
-            
-            # Determine response category
-            if any(word in message_lower for word in ['hello', 'hi', 'hey', 'namaste', 'start']):
-                category = 'greeting'
-            elif any(word in message_lower for word in ['help', 'what can you do', 'capabilities', 'features']):
-                category = 'help'
-            elif any(word in message_lower for word in ['premium', 'upgrade', 'subscription', 'plan']):
-                category = 'premium'
-            elif any(word in message_lower for word in ['earn', 'money', 'payment', 'balance', 'income']):
-                category = 'earnings'
-            elif any(word in message_lower for word in ['feature', 'about', 'what is', 'tell me about']):
-                category = 'features'
-            else:
-                category = 'default'
-            
-            import random
-            response = random.choice(responses[category])
+            category = _message_category(message.lower())
+            
+            response = _RNG.choice(_RESPONSES[category])
             
             # Add contextual information
             if user_context:
@@ -318,34 +731,16 @@ class TelegramBotProduction:
                 referral_code = context.args[0]
             
             # Get or create user
-            db_user = self.get_or_create_user(user, referral_code)
+            db_user = await self.get_or_create_user(user, referral_code)
             
             if not db_user:
                 await update.message.reply_text("Sorry, I'm experiencing technical difficulties. Please try again later.")
                 return
             
-            welcome_text = f"""🎉 Welcome to {APP_NAME}!
-
-I'm your intelligent AI assistant. I can help you with:
-
-🤖 AI-powered conversations
-💡 Creative writing and ideas  
-🔍 Research and analysis
-💻 Coding assistance
-📚 Educational support
-🎯 Problem-solving
-
-💰 Earn money by using the bot!
-- ₹{CHAT_PAY_RATE} per chat
-- ₹{REFERRAL_BONUS} per referral
-
-Your referral code: `{db_user['referral_code']}`
-Share: {DOMAIN}/ref/{db_user['referral_code']}
-
-Type /help for more commands!"""
-
+            code = db_user['referral_code']
+            welcome_text = _WELCOME_TMPL.format_map({'code': code, 'link': _referral_link(code)})
             if referral_code:
-                welcome_text += f"\n\n🎁 You joined using a referral code! Welcome bonus applied!"
+                welcome_text += _WITH_REFERRAL_SUFFIX
             
             await update.message.reply_text(welcome_text, parse_mode='Markdown')
             
@@ -355,49 +750,18 @@ Type /help for more commands!"""
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command"""
-        help_text = f"""🤖 {APP_NAME} - Help
-
-**Available Commands:**
-/start - Start the bot
-/help - Show this help message
-/premium - View premium plans
-/balance - Check your balance
-/referral - Get referral info
-/stats - View your stats
-/models - Available AI models
-/earnings - Earning information
-
-**How to Earn:**
-💬 Chat with AI: ₹{CHAT_PAY_RATE} per message
-👥 Refer friends: ₹{REFERRAL_BONUS} per referral
-⭐ Premium features available
-
-**AI Capabilities:**
-- Answer questions on any topic
-- Creative writing assistance
-- Code help and debugging
-- Research and analysis
-- Educational support
-- General conversation
-
-Just send me any message to start chatting!
-
-🌐 Web Dashboard: {DOMAIN}"""
-        
-        await update.message.reply_text(help_text, parse_mode='Markdown')
+        await update.message.reply_text(_HELP_TEXT, parse_mode='Markdown')
     
     async def premium_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /premium command"""
         telegram_id = str(update.effective_user.id)
         
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-        user_data = cursor.fetchone()
-        conn.close()
+        async with self.get_db() as conn:
+            rows = await conn.execute_fetchall(_SQL_GET_USER, (telegram_id,))
+        user_data = rows[0] if rows else None
         
-        if user_data and user_data[9]:  # is_premium column
-            premium_expires = user_data[10] if user_data[10] else "Never"
+        if user_data and user_data['is_premium']:
+            premium_expires = user_data['premium_expires'] if user_data['premium_expires'] else "Never"
             premium_text = f"""⭐ You have Premium Access!
 
 Expires: {premium_expires}
@@ -441,41 +805,31 @@ Click below to upgrade:"""
         """Handle /balance command"""
         telegram_id = str(update.effective_user.id)
         
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-        user_data = cursor.fetchone()
+        # User row and today's earnings in one statement
+        today = datetime.utcnow().date().isoformat()
+        async with self.get_db() as conn:
+            rows = await conn.execute_fetchall(_SQL_USER_BALANCE, (today, telegram_id))
+        user_data = rows[0] if rows else None
         
         if not user_data:
             await update.message.reply_text("Please use /start first to register!")
-            conn.close()
             return
         
-        # Get today's earnings
-        today = datetime.utcnow().date().isoformat()
-        cursor.execute("SELECT earnings FROM analytics WHERE telegram_id = ? AND date = ?", (telegram_id, today))
-        today_earnings_data = cursor.fetchone()
-        today_earnings = today_earnings_data[0] if today_earnings_data else 0.0
-        
-        # Count referrals
-        cursor.execute("SELECT COUNT(*) FROM users WHERE referred_by = ?", (user_data[6],))  # referral_code column
-        referral_count = cursor.fetchone()[0]
-        
-        conn.close()
+        today_earnings = user_data['today_earnings']
         
         balance_text = f"""💰 Your Balance
 
-**Current Balance:** ₹{user_data[4]:.2f}
-**Total Earned:** ₹{user_data[5]:.2f}
+**Current Balance:** ₹{user_data['balance']:.2f}
+**Total Earned:** ₹{user_data['total_earned']:.2f}
 **Today's Earnings:** ₹{today_earnings:.2f}
 
 **Earning Rates:**
 💬 Per Chat: ₹{CHAT_PAY_RATE}
 👥 Per Referral: ₹{REFERRAL_BONUS}
-👥 Total Referrals: {referral_count}
+👥 Total Referrals: {user_data['referral_count']}
 
-**Referral Code:** `{user_data[6]}`
-**Referral Link:** {DOMAIN}/ref/{user_data[6]}
+**Referral Code:** `{user_data['referral_code']}`
+**Referral Link:** {_referral_link(user_data['referral_code'])}
 
 Minimum withdrawal: ₹100
 Visit {DOMAIN} to withdraw earnings!"""
@@ -486,27 +840,21 @@ Visit {DOMAIN} to withdraw earnings!"""
         """Handle /referral command"""
         telegram_id = str(update.effective_user.id)
         
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-        user_data = cursor.fetchone()
+        async with self.get_db() as conn:
+            rows = await conn.execute_fetchall(_SQL_GET_USER, (telegram_id,))
+        user_data = rows[0] if rows else None
         
         if not user_data:
             await update.message.reply_text("Please use /start first to register!")
-            conn.close()
             return
         
-        # Count referrals
-        cursor.execute("SELECT COUNT(*) FROM users WHERE referred_by = ?", (user_data[6],))
-        referral_count = cursor.fetchone()[0]
+        referral_count = user_data['referral_count']
         referral_earnings = referral_count * REFERRAL_BONUS
         
-        conn.close()
-        
         referral_text = f"""👥 Referral Program
 
-**Your Referral Code:** `{user_data[6]}`
-**Referral Link:** {DOMAIN}/ref/{user_data[6]}
+**Your Referral Code:** `{user_data['referral_code']}`
+**Referral Link:** {_referral_link(user_data['referral_code'])}
 
 **Statistics:**
 👥 Total Referrals: {referral_count}
@@ -527,46 +875,35 @@ Start sharing and earning! 🚀"""
         """Handle /stats command"""
         telegram_id = str(update.effective_user.id)
         
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-        user_data = cursor.fetchone()
+        # User row and chat statistics in one statement
+        today = datetime.utcnow().date().isoformat()
+        async with self.get_db() as conn:
+            rows = await conn.execute_fetchall(_SQL_USER_STATS, (today, telegram_id))
+        user_data = rows[0] if rows else None
         
         if not user_data:
             await update.message.reply_text("Please use /start first to register!")
-            conn.close()
             return
         
-        # Get chat statistics
-        cursor.execute("SELECT COUNT(*) FROM chats WHERE telegram_id = ?", (telegram_id,))
-        total_chats = cursor.fetchone()[0]
-        
-        today = datetime.utcnow().date().isoformat()
-        cursor.execute("SELECT COUNT(*) FROM chats WHERE telegram_id = ? AND date(created_at) = ?", (telegram_id, today))
-        today_chats = cursor.fetchone()[0]
-        
-        # Count referrals
-        cursor.execute("SELECT COUNT(*) FROM users WHERE referred_by = ?", (user_data[6],))
-        referral_count = cursor.fetchone()[0]
-        
-        conn.close()
+        total_chats = user_data['total_chats']
+        today_chats = user_data['today_chats']
         
         stats_text = f"""📊 Your Statistics
 
 **Account Info:**
-👤 Username: {user_data[2]}
-📅 Member Since: {user_data[11][:10]}
-⭐ Premium: {'Yes' if user_data[9] else 'No'}
+👤 Username: {escape_markdown(user_data['username'] or '')}
+📅 Member Since: {user_data['created_at'][:10]}
+⭐ Premium: {'Yes' if user_data['is_premium'] else 'No'}
 
 **Usage Stats:**
 💬 Total Chats: {total_chats}
 📅 Today's Chats: {today_chats}
-💰 Total Earned: ₹{user_data[5]:.2f}
-💳 Current Balance: ₹{user_data[4]:.2f}
+💰 Total Earned: ₹{user_data['total_earned']:.2f}
+💳 Current Balance: ₹{user_data['balance']:.2f}
 
 **Referral Stats:**
-🔗 Your Code: `{user_data[6]}`
-👥 Referrals: {referral_count}
+🔗 Your Code: `{user_data['referral_code']}`
+👥 Referrals: {user_data['referral_count']}
 
 Keep chatting to earn more! 🚀"""
         
@@ -574,56 +911,11 @@ Keep chatting to earn more! 🚀"""
     
     async def models_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /models command"""
-        models_text = f"""🤖 Available AI Models
-
-**Free Models:**
-🆓 Ganesh AI Fallback - Always available
-🆓 Basic Assistant - General queries
-
-**Premium Models:** ⭐
-🧠 GPT-4 - Advanced reasoning
-🎯 Claude 3 - Creative writing
-🚀 Gemini Pro - Multi-modal AI
-💡 GPT-4o Mini - Fast responses
-
-**Model Features:**
-✅ Instant responses
-✅ Context awareness
-✅ Multi-language support
-✅ Creative capabilities
-✅ Technical assistance
-
-Upgrade to Premium to access all models!
-Visit {DOMAIN} for more details."""
-        
-        await update.message.reply_text(models_text, parse_mode='Markdown')
+        await update.message.reply_text(_MODELS_TEXT, parse_mode='Markdown')
     
     async def earnings_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /earnings command"""
-        earnings_text = f"""💰 Earning Information
-
-**How to Earn:**
-💬 Chat Messages: ₹{CHAT_PAY_RATE} each
-👥 Referrals: ₹{REFERRAL_BONUS} each
-⭐ Premium Bonus: 2x rates
-🎁 Daily Bonuses: Available
-🏆 Challenges: Extra rewards
-
-**Premium Benefits:**
-✅ Double earning rates
-✅ Exclusive bonuses
-✅ Priority payouts
-✅ Special challenges
-
-**Payout Information:**
-💳 Minimum: ₹100
-🏦 Methods: UPI, Bank Transfer
-⏰ Processing: 24-48 hours
-🔒 Secure & Reliable
-
-Start earning today! Every chat pays! 🚀"""
-        
-        await update.message.reply_text(earnings_text, parse_mode='Markdown')
+        await update.message.reply_text(_EARNINGS_TEXT, parse_mode='Markdown')
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle regular messages"""
@@ -632,77 +924,53 @@ Start earning today! Every chat pays! 🚀"""
             message_text = update.message.text
             
             # Get or create user
-            user = self.get_or_create_user(update.effective_user)
+            user = await self.get_or_create_user(update.effective_user)
             if not user:
                 await update.message.reply_text("Sorry, I'm experiencing technical difficulties. Please try again later.")
                 return
             
-            # Send typing indicator
-            await context.bot.send_chat_action(chat_id=update.effective_chat.id, action='typing')
-            
             # Determine earning rate
-            is_premium = user.get('is_premium', False)
+            is_premium = bool(user['is_premium'])
             earning_rate = CHAT_PAY_RATE * (2 if is_premium else 1)
             
             # Generate AI response
             user_context = {
                 'is_premium': is_premium,
                 'platform': 'telegram',
-                'username': user.get('username', 'User')
+                'username': user['username'] or 'User'
             }
             
-            ai_response = await self.generate_ai_response(message_text, user_context)
-            
-            # Save chat and update earnings
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            
-            # Save chat
-            cursor.execute('''
-                INSERT INTO chats (telegram_id, message, response, ai_model, tokens_used, cost, earnings)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                telegram_id,
-                message_text,
-                ai_response['response'],
-                ai_response['model'],
-                ai_response['tokens'],
-                ai_response['cost'],
-                earning_rate
-            ))
-            
-            # Update user balance
-            cursor.execute('''
-                UPDATE users 
-                SET balance = balance + ?, total_earned = total_earned + ?, last_active = ?
-                WHERE telegram_id = ?
-            ''', (earning_rate, earning_rate, datetime.utcnow().isoformat(), telegram_id))
+            # Send the typing indicator while the response is generated
+            typing_task = asyncio.create_task(
+                context.bot.send_chat_action(chat_id=update.effective_chat.id, action='typing')
+            )
+            ai_task = asyncio.create_task(self.generate_ai_response(message_text, user_context))
+            ai_response, _ = await asyncio.gather(ai_task, typing_task)
             
-            # Update daily analytics
-            today = datetime.utcnow().date().isoformat()
-            cursor.execute('''
-                INSERT OR REPLACE INTO analytics (telegram_id, date, chats, earnings)
-                VALUES (?, ?, 
-                    COALESCE((SELECT chats FROM analytics WHERE telegram_id = ? AND date = ?), 0) + 1,
-                    COALESCE((SELECT earnings FROM analytics WHERE telegram_id = ? AND date = ?), 0) + ?
-                )
-            ''', (telegram_id, today, telegram_id, today, telegram_id, today, earning_rate))
+            # Queue chat, balance and analytics writes for the batch flusher
+            now = datetime.utcnow()
+            self._write_queue.put_nowait({
+                'telegram_id': telegram_id,
+                'message': message_text,
+                'response': ai_response['response'],
+                'model': ai_response['model'],
+                'tokens': ai_response['tokens'],
+                'cost': ai_response['cost'],
+                'earnings': earning_rate,
+                'last_active': now.isoformat(),
+                'date': now.date().isoformat()
+            })
             
-            conn.commit()
-            conn.close()
+            # The write is deferred; apply it to the cached row so later messages see it too
+            user['balance'] += earning_rate
+            user['total_earned'] += earning_rate
+            new_balance = user['balance']
             
             # Send response with earning info
             response_text = ai_response['response']
             if len(response_text) > 4000:  # Telegram message limit
                 response_text = response_text[:4000] + "..."
             
-            # Get updated balance
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT balance FROM users WHERE telegram_id = ?", (telegram_id,))
-            new_balance = cursor.fetchone()[0]
-            conn.close()
-            
             earning_info = f"\n\n💰 +₹{earning_rate:.2f} earned | Balance: ₹{new_balance:.2f}"
             
             await update.message.reply_text(response_text + earning_info)
@@ -713,20 +981,6 @@ Start earning today! Every chat pays! 🚀"""
                 "I apologize, but I'm experiencing technical difficulties. Please try again in a moment."
             )
     
-    async def set_webhook(self):
-        """Set webhook for the bot"""
-        if not self.bot or not WEBHOOK_URL:
-            logger.warning("⚠️ Cannot set webhook: Bot or webhook URL not configured")
-            return False
-        
-        try:
-            await self.bot.set_webhook(url=WEBHOOK_URL)
-            logger.info(f"✅ Webhook set to: {WEBHOOK_URL}")
-            return True
-        except Exception as e:
-            logger.error(f"❌ Failed to set webhook: {str(e)}")
-            return False
-    
     async def process_webhook(self, update_data: dict):
         """Process webhook update"""
         if not self.application:
@@ -734,27 +988,17 @@ Start earning today! Every chat pays! 🚀"""
             return
         
         try:
+            await self._start_background_tasks()
             update = Update.de_json(update_data, self.bot)
             await self.application.process_update(update)
         except Exception as e:
             logger.error(f"❌ Webhook processing error: {str(e)}")
-    
-    def run_polling(self):
-        """Run bot in polling mode"""
-        if not self.application:
-            logger.error("❌ Cannot run polling: Application not configured")
-            return
-        
-        logger.info("🚀 Starting Telegram bot in polling mode...")
-        self.application.run_polling()
 
 # =========================
 # MAIN EXECUTION
 # =========================
 
-def main():
-    """Main function"""
-    print(f"""
+_BANNER = f"""
     🤖 ================================
        {APP_NAME} TELEGRAM BOT
     ================================
@@ -765,29 +1009,126 @@ def main():
     📊 Analytics
     
     Starting bot...
-    """)
+    
+"""
+
+def _stop_event() -> asyncio.Event:
+    """Return an event set by SIGINT/SIGTERM, so shutdown runs on the loop instead of unwinding via KeyboardInterrupt"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows loops have no signal handlers; Ctrl-C still raises KeyboardInterrupt there
+            pass
+    return stop
+
+async def _idle():
+    """Wait on the event loop until SIGINT/SIGTERM"""
+    await _stop_event().wait()
+
+async def main_async(bot: TelegramBotProduction, use_webhook: bool):
+    """Run the bot's whole lifecycle on a single event loop"""
+    application = bot.application
+    stop = _stop_event()
+    
+    # main_async() is the only startup path, so it runs the bot's own init/shutdown hooks around PTB's
+    try:
+        # Bot.get_me() and the database connections don't depend on each other. Let both
+        # finish even if one fails, so the finally block closes whatever was opened
+        for result in await asyncio.gather(
+            application.initialize(), bot._post_init(application), return_exceptions=True
+        ):
+            if isinstance(result, BaseException):
+                raise result
+        await application.start()
+        
+        # start_webhook() also registers WEBHOOK_URL with Telegram; start_polling() removes it
+        if use_webhook:
+            logger.info(f"🚀 Starting Telegram bot in webhook mode on port {PORT}...")
+            await application.updater.start_webhook(
+                listen='0.0.0.0',
+                port=PORT,
+                url_path=urlparse(WEBHOOK_URL).path,
+                webhook_url=WEBHOOK_URL,
+                allowed_updates=ALLOWED_UPDATES
+            )
+        else:
+            logger.info("🚀 Starting Telegram bot in polling mode...")
+            await application.updater.start_polling(timeout=POLL_TIMEOUT, allowed_updates=ALLOWED_UPDATES)
+        
+        await stop.wait()
+        logger.info("🛑 Bot stopping, flushing pending work...")
+    finally:
+        if application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        await bot._post_shutdown(application)
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description=f"{APP_NAME} Telegram bot")
+    parser.add_argument(
+        '--mode',
+        choices=['polling', 'webhook', 'auto'],
+        default='auto',
+        help="how to receive updates; 'auto' uses a webhook when WEBHOOK_URL is set, polling otherwise"
+    )
+    args = parser.parse_args(argv)
+    if args.mode == 'webhook' and not WEBHOOK_URL:
+        parser.error("--mode webhook requires WEBHOOK_URL")
+    return args
+
+def main():
+    """Main function"""
+    args = parse_args()
+    use_webhook = args.mode == 'webhook' or (args.mode == 'auto' and bool(WEBHOOK_URL))
+    
+    # No per-coroutine origin frames, even under -X dev; asyncio.run(debug=False) below
+    # likewise keeps the loop's debug checks off
+    sys.set_coroutine_origin_tracking_depth(0)
+    
+    # Use the libuv-based event loop when available (not on Windows); the
+    # stock asyncio loop is used otherwise
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
+    # Optionally pin the bot to one core (Linux only) so the loop keeps a warm cache; threads
+    # started from here on (database, resolver) inherit the mask. Match the NIC's IRQ affinity to it
+    if BOT_CPU and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {int(BOT_CPU)})
+        except (ValueError, OSError) as e:
+            logger.warning(f"⚠️ Cannot pin bot to CPU {BOT_CPU}: {str(e)}")
+    
+    # Startup goes through the log handlers like everything else; the ASCII banner shows at DEBUG
+    logger.info("Starting %s bot", APP_NAME)
+    logger.debug(_BANNER)
     
     bot = TelegramBotProduction()
     
     if bot.application:
         logger.info("✅ Bot initialized successfully")
         
-        # Set webhook if URL is provided
-        if WEBHOOK_URL and WEBHOOK_URL != '':
-            import asyncio
-            asyncio.run(bot.set_webhook())
-        
-        # Run in polling mode for testing
-        bot.run_polling()
+        try:
+            asyncio.run(main_async(bot, use_webhook), debug=False)
+        except KeyboardInterrupt:
+            logger.info("🛑 Bot stopped by user")
     else:
         logger.warning("⚠️ Bot running in demo mode - configure TELEGRAM_TOKEN for full functionality")
         
-        # Keep the script running for webhook processing
+        # Keep the script running for webhook processing; idle on the event loop until a signal arrives
         try:
-            while True:
-                time.sleep(1)
+            asyncio.run(_idle(), debug=False)
         except KeyboardInterrupt:
-            logger.info("🛑 Bot stopped by user")
+            pass
+        logger.info("🛑 Bot stopped by user")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file